@@ -0,0 +1,221 @@
+"""
+Batch solving of puzzle files on a process pool.
+
+Puzzles use the common one-per-line format: 81 characters in row-major
+order, with '0' or '.' for an empty cell. Lines that are empty or start
+with '#' are skipped. Packed corpus files (see corpus.py) are read too,
+and --start/--stop then seek straight to the records they need.
+
+Usage:
+    python batch.py puzzles.txt [-o solutions.txt] [--chunk-size 64] [--workers 8]
+                                [--engine scalar|vectorized] [--strategy backtrack|dlx]
+                                [--cache solutions.db] [--start 1000 --stop 2000]
+
+Each output line holds the solution (or the puzzle when it could not be
+solved), the status and the solve time in seconds. With an output file
+ending in .sdk the results are written as a packed corpus instead, with
+solution and stats records.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from cache import SolutionCache
+from corpus import Corpus, CorpusWriter, is_corpus
+from main import STRATEGIES, Sudoku
+from stats import SolverStats
+
+SolveResult = namedtuple("SolveResult", "index puzzle solution status seconds nodes")
+
+
+def parse_puzzle(line):
+    """
+    Parses an 81-character puzzle line into a 9x9 grid.
+
+    Raises:
+        ValueError: If the line is not 81 digits or '.' characters.
+    """
+    text = line.strip()[:81]
+    if len(text) != 81 or any(ch not in "0123456789." for ch in text):
+        raise ValueError(f"Not an 81-character puzzle: {line.strip()!r}")
+    values = [0 if ch == "." else int(ch) for ch in text]
+    return [values[i:i + 9] for i in range(0, 81, 9)]
+
+
+def format_grid(grid):
+    """Formats a 9x9 grid as an 81-character line, '.' for empty cells."""
+    return "".join(str(value) if value != 0 else "." for row in grid for value in row)
+
+
+def read_puzzles(path, start=0, stop=None):
+    """
+    Yields puzzle lines from a text file, a packed corpus, or stdin ('-').
+
+    Args:
+        path (str): The file to read.
+        start (int, optional): Index of the first puzzle. Defaults to 0.
+        stop (int, optional): Index after the last puzzle. Defaults to None
+                              (read to the end).
+    """
+    if path != "-" and is_corpus(path):
+        with Corpus(path) as corpus:
+            for index in range(*slice(start, stop).indices(len(corpus))):
+                yield corpus.text(index)
+        return
+    stream = sys.stdin if path == "-" else open(path)
+    try:
+        lines = (line.strip() for line in stream)
+        yield from islice((line for line in lines if line and not line.startswith("#")), start, stop)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def solve_puzzle(puzzle, strategy="backtrack"):
+    """
+    Solves one puzzle line with the given Sudoku.solve_sudoku strategy.
+
+    Returns:
+        tuple: (solution, status, seconds, nodes). The solution is an
+               81-character line, or None when the status is "unsolvable"
+               or "invalid"; 'nodes' counts the search nodes used.
+    """
+    start = time.perf_counter()
+    stats = SolverStats()
+    try:
+        sudoku = Sudoku(parse_puzzle(puzzle), stats=stats)
+    except ValueError:
+        return None, "invalid", 0.0, 0
+    solved = sudoku.solve_sudoku(strategy=strategy)
+    seconds = time.perf_counter() - start
+    if solved:
+        return format_grid(sudoku.grid), "solved", seconds, stats.nodes
+    return None, "unsolvable", seconds, stats.nodes
+
+
+def solve_chunk(puzzles, engine="scalar", strategy="backtrack"):
+    """
+    Solves a list of puzzle lines; runs inside the worker processes.
+
+    Args:
+        puzzles (list): 81-character puzzle lines.
+        engine (str, optional): "scalar" solves each puzzle with
+                                Sudoku.solve_sudoku, "vectorized" runs
+                                NumPy propagation over the whole chunk first.
+                                Defaults to "scalar".
+        strategy (str, optional): Search used for each puzzle, "backtrack"
+                                  or "dlx". Defaults to "backtrack".
+    """
+    if engine == "vectorized":
+        from vectorized import solve_lines  # vectorized imports this module
+        return solve_lines(puzzles, strategy)
+    if engine != "scalar":
+        raise ValueError(f"Unknown engine {engine!r}.")
+    return [solve_puzzle(puzzle, strategy) for puzzle in puzzles]
+
+
+def open_cache(path):
+    """Pool initializer: gives each worker its own handle on the solution cache."""
+    Sudoku.solution_cache = SolutionCache(path)
+
+
+def solve_many(puzzles, chunk_size=64, workers=None, max_pending=None, engine="scalar", strategy="backtrack",
+               cache=None):
+    """
+    Solves puzzles on a process pool, yielding results in input order.
+
+    The input is read lazily, one chunk at a time, and at most
+    'max_pending' chunks are queued on the pool, so memory stays bounded
+    however long the input is. Each result is yielded as soon as it and
+    every result before it are done.
+
+    Args:
+        puzzles (iterable): 81-character puzzle lines.
+        chunk_size (int, optional): Puzzles sent to a worker at once.
+                                    Defaults to 64.
+        workers (int, optional): Worker processes. Defaults to the number
+                                 of CPUs.
+        max_pending (int, optional): Chunks queued at once. Defaults to
+                                     twice the number of workers.
+        engine (str, optional): "scalar" or "vectorized", see solve_chunk.
+                                Defaults to "scalar".
+        strategy (str, optional): "backtrack" or "dlx", see solve_chunk.
+                                  Defaults to "backtrack".
+        cache (str, optional): SQLite file of a SolutionCache shared by the
+                               workers. Defaults to None (no cache).
+
+    Yields:
+        SolveResult: (index, puzzle, solution, status, seconds, nodes) per
+                     puzzle.
+    """
+    puzzles = iter(puzzles)
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    index = 0
+    initializer, initargs = (open_cache, (cache,)) if cache else (None, ())
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        pending = deque()  # (chunk, future) in input order
+
+        def submit():
+            chunk = list(islice(puzzles, chunk_size))
+            if chunk:
+                pending.append((chunk, pool.submit(solve_chunk, chunk, engine, strategy)))
+            return bool(chunk)
+
+        while len(pending) < max_pending and submit():
+            pass
+        while pending:
+            chunk, future = pending.popleft()
+            results = future.result()
+            submit()
+            for puzzle, (solution, status, seconds, nodes) in zip(chunk, results):
+                yield SolveResult(index, puzzle, solution, status, seconds, nodes)
+                index += 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve a file of 81-character Sudoku puzzles.")
+    parser.add_argument("puzzles", help="puzzle file, one puzzle per line ('-' for stdin)")
+    parser.add_argument("-o", "--output", help="write results here instead of stdout")
+    parser.add_argument("--chunk-size", type=int, default=64, help="puzzles per worker task")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--engine", choices=("scalar", "vectorized"), default="scalar",
+                        help="solve one puzzle at a time, or propagate whole chunks with NumPy first")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="backtrack",
+                        help="search used per puzzle: arc consistency backtracking or Dancing Links")
+    parser.add_argument("--cache", metavar="DB", help="SQLite solution cache to answer repeated puzzles from")
+    parser.add_argument("--start", type=int, default=0, help="index of the first puzzle to solve")
+    parser.add_argument("--stop", type=int, default=None, help="index after the last puzzle to solve")
+    args = parser.parse_args(argv)
+
+    packed = args.output is not None and args.output.endswith(".sdk")
+    if packed:
+        out = CorpusWriter(args.output, solutions=True, stats=True)
+    else:
+        out = open(args.output, "w") if args.output else sys.stdout
+    counts = {}
+    start = time.perf_counter()
+    try:
+        puzzles = read_puzzles(args.puzzles, args.start, args.stop)
+        for result in solve_many(puzzles, args.chunk_size, args.workers,
+                                 engine=args.engine, strategy=args.strategy, cache=args.cache):
+            if packed:
+                if result.status != "invalid":
+                    out.write(result.puzzle, result.solution, result.status, result.nodes, result.seconds)
+            else:
+                out.write(f"{result.solution or result.puzzle}\t{result.status}\t{result.seconds:.6f}\n")
+            counts[result.status] = counts.get(result.status, 0) + 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    total = sum(counts.values())
+    elapsed = time.perf_counter() - start
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"{total} puzzles in {elapsed:.2f} seconds ({summary}).", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Reproducible benchmark of solver throughput and latency.
+
+The puzzle sets are checked in under benchmarks/: one file per
+generate_puzzle difficulty plus a set of well-known hard puzzles. For each
+set the suite reports latency percentiles, puzzles per second, peak
+traced memory, search nodes and revise calls as JSON.
+
+Usage:
+    python bench.py [--sets easy hard] [--repeat 3] [--rules hidden_singles pointing] [-o results.json]
+    python bench.py --strategy dlx -o dlx.json
+    python bench.py --sets --corpus big.sdk --sample 500 [--seed 1]
+    python bench.py --compare baseline.json [--threshold 0.10]
+
+In compare mode every metric is checked against the baseline file and
+the command exits with status 1 if any of them regressed by more than
+the threshold.
+
+--corpus benchmarks a random sample of a packed corpus (see corpus.py),
+reading only the sampled records, as an extra set named after the file.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from batch import parse_puzzle, read_puzzles
+from corpus import Corpus
+from main import STRATEGIES, Sudoku
+from propagation import RULES
+from stats import SolverStats
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+SETS = ("easy", "mid", "hard", "expert", "known_hard")
+
+# Metrics where a larger value is worse; puzzles_per_second and solved are the reverse
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "mean_ms", "peak_memory_kb", "nodes", "revise_calls")
+HIGHER_IS_BETTER = ("puzzles_per_second", "solved")
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def run_set(name, repeat=1, rules=None, strategy="backtrack"):
+    """Benchmarks one of the checked-in puzzle sets, see run_puzzles."""
+    return run_puzzles(list(read_puzzles(os.path.join(BENCH_DIR, f"{name}.txt"))), repeat, rules, strategy)
+
+
+def sample_corpus(path, size, seed=0):
+    """
+    Picks 'size' random puzzles from a packed corpus.
+
+    Only the sampled records are read, so this is cheap on huge files.
+
+    Returns:
+        list: The puzzles as 81-character lines, in corpus order.
+    """
+    with Corpus(path) as corpus:
+        indices = sorted(random.Random(seed).sample(range(len(corpus)), min(size, len(corpus))))
+        return [corpus.text(index) for index in indices]
+
+
+def run_puzzles(puzzles, repeat=1, rules=None, strategy="backtrack"):
+    """
+    Benchmarks a list of puzzle lines.
+
+    Each puzzle is solved 'repeat' times and its fastest time is kept.
+    Peak memory is measured in a separate pass with tracemalloc, so its
+    overhead does not leak into the timings. With 'rules', the named
+    propagation rules are enabled and their counters are reported too.
+    'strategy' is passed on to solve_sudoku, so the engines can be compared
+    on the same sets.
+
+    Returns:
+        dict: The metrics of the set.
+    """
+    latencies = []
+    stats = SolverStats()
+    counted = [RULES[rule]() for rule in rules or ()]  # Shared, so counters add up over the set
+    solved = 0
+    for puzzle in puzzles:
+        best = None
+        for attempt in range(repeat):
+            if attempt == 0:
+                sudoku = Sudoku(parse_puzzle(puzzle), stats=stats, rules=counted)
+            else:
+                sudoku = Sudoku(parse_puzzle(puzzle), rules=rules)
+            start = time.perf_counter()
+            ok = sudoku.solve_sudoku(strategy=strategy)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        latencies.append(best)
+        solved += ok
+
+    peak = 0
+    tracemalloc.start()
+    for puzzle in puzzles:
+        tracemalloc.reset_peak()
+        Sudoku(parse_puzzle(puzzle), rules=rules).solve_sudoku(strategy=strategy)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    total = sum(latencies)
+    metrics = {
+        "puzzles": len(puzzles),
+        "solved": solved,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": total / len(puzzles) * 1000,
+        "puzzles_per_second": len(puzzles) / total if total else 0.0,
+        "peak_memory_kb": peak / 1024,
+        "nodes": stats.nodes,
+        "revise_calls": stats.revise_calls,
+    }
+    if counted:
+        metrics["rules"] = {rule.name: rule.counters() for rule in counted}
+    return metrics
+
+
+def run(sets=SETS, repeat=1, rules=None, strategy="backtrack", corpus=None, sample=1000, seed=0):
+    """Benchmarks several sets, and a corpus sample if given, and returns the full JSON-ready report."""
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "strategy": strategy,
+        "rules": list(rules or ()),
+        "sets": {name: run_set(name, repeat, rules, strategy) for name in sets},
+    }
+    if corpus is not None:
+        name = os.path.splitext(os.path.basename(corpus))[0]
+        report["sets"][name] = run_puzzles(sample_corpus(corpus, sample, seed), repeat, rules, strategy)
+    return report
+
+
+def compare(current, baseline, threshold=0.10):
+    """
+    Lists the metrics of 'current' that are worse than 'baseline'.
+
+    Args:
+        current (dict): A report from run().
+        baseline (dict): A saved report to compare against.
+        threshold (float, optional): Allowed relative change before a metric
+                                     counts as regressed. Defaults to 0.10.
+
+    Returns:
+        list: One message per regressed metric.
+    """
+    regressions = []
+    for name, metrics in current["sets"].items():
+        base = baseline["sets"].get(name)
+        if base is None:
+            continue
+        for key in LOWER_IS_BETTER:
+            if key in base and metrics[key] > base[key] * (1 + threshold):
+                regressions.append(f"{name}.{key}: {base[key]:.4g} -> {metrics[key]:.4g}")
+        for key in HIGHER_IS_BETTER:
+            if key in base and metrics[key] < base[key] * (1 - threshold):
+                regressions.append(f"{name}.{key}: {base[key]:.4g} -> {metrics[key]:.4g}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Sudoku solver on the checked-in puzzle sets.")
+    parser.add_argument("--sets", nargs="*", choices=SETS, default=list(SETS), help="puzzle sets to run")
+    parser.add_argument("--repeat", type=int, default=1, help="solves per puzzle, the fastest is kept")
+    parser.add_argument("--rules", nargs="*", choices=sorted(RULES), default=[],
+                        help="propagation rules to enable after arc consistency")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="backtrack", help="solver engine to benchmark")
+    parser.add_argument("--corpus", help="packed corpus to benchmark a random sample of")
+    parser.add_argument("--sample", type=int, default=1000, help="puzzles sampled from --corpus")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the corpus sample")
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against a saved report")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change allowed in compare mode")
+    args = parser.parse_args(argv)
+
+    report = run(args.sets, args.repeat, args.rules, args.strategy, args.corpus, args.sample, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Board geometry shared by every Sudoku instance.
+
+A board with box size n has n*n rows, columns and boxes, and n**4 cells
+numbered in row-major order. The unit and peer tables of each box size
+are computed once, by board_for(n), and shared by every puzzle of that
+size, so constructing a Sudoku does not rebuild them. Candidate values
+are stored as bitmasks where bit (v - 1) is set when v is still possible
+for that cell.
+
+The module-level names (SIZE, CELLS, ROWS, PEERS, ...) describe the
+standard 9x9 board.
+"""
+from array import array
+from collections.abc import Sequence
+from functools import lru_cache
+from math import isqrt
+
+MAX_BOX = 8  # A mask of 64 values is the widest array typecode
+
+
+class Board:
+    """
+    Unit and peer tables of an n*n by n*n board.
+
+    Attributes:
+        box (int): Box size n (3 for the standard board).
+        size (int): Rows, columns, boxes and values: n * n.
+        cells (int): Number of cells: size * size.
+        all_values (int): The mask with every value set.
+        row_of, col_of, box_of (tuple): Row, column and box of each cell.
+        rows, cols, boxes (tuple): Cells of each row, column and box.
+        units (tuple): rows + cols + boxes.
+        peers (tuple): Cells sharing a unit with each cell, in order.
+        arcs (Arcs): Every (i, j) pair with j a peer of i.
+        typecode (str): array typecode wide enough for a mask.
+    """
+    def __init__(self, box):
+        if not 1 <= box <= MAX_BOX:
+            raise ValueError(f"Box size must be from 1 to {MAX_BOX}, got {box}.")
+        self.box = box
+        self.size = size = box * box
+        self.cells = cells = size * size
+        self.all_values = (1 << size) - 1
+        self.typecode = "H" if size <= 16 else "I" if size <= 32 else "Q"
+
+        self.row_of = tuple(i // size for i in range(cells))
+        self.col_of = tuple(i % size for i in range(cells))
+        self.box_of = tuple((i // size) // box * box + (i % size) // box for i in range(cells))
+
+        self.rows = tuple(tuple(range(r * size, (r + 1) * size)) for r in range(size))
+        self.cols = tuple(tuple(range(c, cells, size)) for c in range(size))
+        boxes = [[] for _ in range(size)]
+        for i in range(cells):
+            boxes[self.box_of[i]].append(i)
+        self.boxes = tuple(tuple(cells_of_box) for cells_of_box in boxes)
+        self.units = self.rows + self.cols + self.boxes
+
+        self.peers = tuple(
+            tuple(sorted(set(self.rows[self.row_of[i]] + self.cols[self.col_of[i]] + self.boxes[self.box_of[i]]) - {i}))
+            for i in range(cells)
+        )
+        self.arcs = Arcs(self.peers)
+
+    def __repr__(self):
+        return f"Board(box={self.box})"
+
+
+class Arcs(Sequence):
+    """
+    Every arc (i, j) of the constraint graph, computed on access.
+
+    All cells have the same number of peers, so arc k is (i, peers[i][p])
+    with i, p = divmod(k, peer count). Nothing is stored besides the peer
+    table, which keeps large boards compact: a 25x25 board has 45,000 arcs.
+    """
+    def __init__(self, peers):
+        self._peers = peers
+        self._per_cell = len(peers[0]) if peers else 0
+
+    def __len__(self):
+        return len(self._peers) * self._per_cell
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self[i] for i in range(*k.indices(len(self)))]
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError("arc index out of range")
+        i, p = divmod(k, self._per_cell)
+        return i, self._peers[i][p]
+
+    def __iter__(self):
+        for i, peers in enumerate(self._peers):
+            for j in peers:
+                yield i, j
+
+
+@lru_cache(maxsize=None)
+def board_for(box):
+    """The shared Board of a box size."""
+    return Board(box)
+
+
+def box_of_size(size):
+    """
+    The box size of a board with 'size' rows.
+
+    Raises:
+        ValueError: If 'size' is not a perfect square.
+    """
+    box = isqrt(size)
+    if box * box != size or box < 1:
+        raise ValueError(f"A board needs a square number of rows, got {size}.")
+    return box
+
+
+STANDARD = board_for(3)
+
+SIZE = STANDARD.size
+BOX = STANDARD.box
+CELLS = STANDARD.cells
+ALL_VALUES = STANDARD.all_values  # Every value 1-9 still possible
+
+ROW_OF = STANDARD.row_of
+COL_OF = STANDARD.col_of
+BOX_OF = STANDARD.box_of
+
+ROWS = STANDARD.rows
+COLS = STANDARD.cols
+BOXES = STANDARD.boxes
+UNITS = STANDARD.units
+
+# The 20 cells that share a row, column or box with each cell
+PEERS = STANDARD.peers
+
+
+def bit(value):
+    """Returns the mask with only 'value' set."""
+    return 1 << (value - 1)
+
+
+def mask_values(mask):
+    """Lists the values set in 'mask' in increasing order."""
+    values = []
+    while mask:
+        low = mask & -mask
+        values.append(low.bit_length())
+        mask ^= low
+    return values
+
+
+def is_single(mask):
+    """True if exactly one value is set in 'mask'."""
+    return mask != 0 and mask & (mask - 1) == 0
+
+
+class DomainStore:
+    """
+    Candidate values of every cell, kept as bitmasks in one flat array.
+
+    Attributes:
+        board (Board): Geometry of the grid.
+        masks (array): One unsigned mask per cell, indexed by cell number;
+                       16-bit up to 16x16, 32-bit up to 32 values
+                       and 64-bit above.
+    """
+    __slots__ = ("board", "masks")
+
+    def __init__(self, grid=None, board=STANDARD):
+        """
+        Builds the store for a grid.
+
+        Args:
+            grid (list, optional): A grid, 0 for empty cells. Filled cells
+                                   get a single candidate, empty cells every
+                                   value. Defaults to None (an empty board).
+            board (Board, optional): Geometry of the grid. Defaults to the
+                                     standard 9x9 board.
+        """
+        self.board = board
+        self.masks = array(board.typecode, [board.all_values] * board.cells)
+        if grid:
+            self.load(grid)
+
+    def load(self, grid):
+        """Resets every mask from the values in 'grid'."""
+        board = self.board
+        masks = self.masks
+        for i in range(board.cells):
+            value = grid[board.row_of[i]][board.col_of[i]]
+            masks[i] = bit(value) if value != 0 else board.all_values
+
+    def size(self, i):
+        """Number of candidates left for cell i."""
+        return self.masks[i].bit_count()
+
+    def values(self, i):
+        """Candidates left for cell i, in increasing order."""
+        return mask_values(self.masks[i])
+
+    def as_sets(self):
+        """Returns the domains as a size x size list of sets."""
+        size = self.board.size
+        return [[set(mask_values(self.masks[r * size + c])) for c in range(size)] for r in range(size)]
@@ -0,0 +1,80 @@
+"""
+Limits on how much work a solve may do.
+
+A SolveBudget is passed to Sudoku.solve_sudoku(budget=...). The search
+charges it once per node and stops with a "budget_exceeded" (or
+"cancelled") status instead of running on.
+"""
+import threading
+import time
+
+
+class BudgetExceeded(Exception):
+    """Raised inside the search when a SolveBudget runs out."""
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status  # "budget_exceeded" or "cancelled"
+
+
+class SolveBudget:
+    """
+    A node and/or time limit for one solve, which can also be cancelled.
+
+    Safe to read and cancel from another thread while the solve runs.
+
+    Attributes:
+        max_nodes (int): Search nodes allowed, or None for no limit.
+        time_limit (float): Seconds allowed, or None for no limit.
+        nodes (int): Search nodes used so far.
+    """
+    def __init__(self, max_nodes=None, time_limit=None, cancel_event=None):
+        """
+        Args:
+            max_nodes (int, optional): Search nodes allowed. Defaults to None.
+            time_limit (float, optional): Seconds allowed. Defaults to None.
+            cancel_event (optional): Event to cancel through, which several
+                                     budgets may share; a
+                                     multiprocessing.Event cancels solves in
+                                     other processes too. Defaults to a new
+                                     threading.Event.
+        """
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.nodes = 0
+        self._deadline = None
+        self._cancelled = cancel_event if cancel_event is not None else threading.Event()
+
+    def start(self):
+        """Resets the node count and starts the clock."""
+        self.nodes = 0
+        if self.time_limit is not None:
+            self._deadline = time.perf_counter() + self.time_limit
+
+    def remaining(self):
+        """Seconds left before the time limit, or None without one."""
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - time.perf_counter())
+
+    def cancel(self):
+        """Makes the solve stop at its next node."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def charge(self):
+        """
+        Counts one search node.
+
+        Raises:
+            BudgetExceeded: If the solve was cancelled or a limit is reached.
+        """
+        self.nodes += 1
+        if self._cancelled.is_set():
+            raise BudgetExceeded("cancelled")
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise BudgetExceeded("budget_exceeded")
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise BudgetExceeded("budget_exceeded")
@@ -0,0 +1,190 @@
+"""
+Solution cache in front of Sudoku.solve_sudoku.
+
+Solutions are stored under the canonical form of their puzzle (see
+canonical.py), so a puzzle that is a relabeled, permuted or transposed
+copy of one solved before is answered by mapping the stored solution back
+through the inverse transform. They are stored under the exact puzzle as
+well, so a plain repeat is answered without canonicalizing, also after a
+restart. Recently used entries are kept in an in-memory LRU and every
+entry is written to a SQLite file.
+
+A lookup tries the exact key first, which costs microseconds from memory
+and one indexed SQLite read otherwise. Only on a miss is the canonical
+form computed, once, and put() reuses it. That computation is capped at
+max_work (see canonical_form), a few milliseconds at most with the
+default; puzzles that need more are cached by their exact grid only.
+
+Set Sudoku.solution_cache = SolutionCache("solutions.db") to enable it.
+Boards other than 9x9, and puzzles with fewer than MIN_CANONICAL_CLUES
+givens, are cached by their exact grid only: canonicalizing sparse grids
+is slow, because almost every arrangement ties.
+"""
+import sqlite3
+import threading
+from collections import OrderedDict
+from canonical import canonical_form
+
+MIN_CANONICAL_CLUES = 17  # Fewer givens never have a unique solution
+CANONICAL_WORK = 2000  # canonical_form work allowed per puzzle, ~10 ms at most
+
+
+def _encode(grid):
+    """A grid as a string key: one character per cell, '0'-'9' then 'A'..."""
+    return "".join(chr(48 + value) if value < 10 else chr(55 + value) for row in grid for value in row)
+
+
+def _decode(text, size):
+    values = [ord(ch) - 48 if ch <= "9" else ord(ch) - 55 for ch in text]
+    return [values[r * size:(r + 1) * size] for r in range(size)]
+
+
+class _Keys:
+    """The keys of one puzzle; the canonical form is computed on first use."""
+    __slots__ = ("grid", "exact", "max_work", "_canonical")
+
+    def __init__(self, grid, max_work=CANONICAL_WORK):
+        self.grid = grid
+        self.exact = _encode(grid)
+        self.max_work = max_work
+        self._canonical = False  # Not computed yet
+
+    @property
+    def canonical(self):
+        """(key, transform), or None when the puzzle is cached exactly only."""
+        if self._canonical is False:
+            grid = self.grid
+            if len(grid) == 9 and sum(1 for row in grid for value in row if value) >= MIN_CANONICAL_CLUES:
+                self._canonical = canonical_form(grid, self.max_work)
+            else:
+                self._canonical = None
+        return self._canonical
+
+
+class SolutionCache:
+    """
+    LRU of solutions keyed by canonical puzzle, backed by SQLite.
+
+    Safe to share between threads. Worker processes should each open
+    their own instance on the same file.
+
+    Attributes:
+        path (str): SQLite file, or None to keep the cache in memory only.
+        capacity (int): Entries kept in the in-memory LRU.
+        max_work (int): Work allowed to canonicalize one puzzle, or None
+                        for no limit.
+        hits (int): Lookups answered from memory or disk.
+        misses (int): Lookups that found nothing.
+    """
+    def __init__(self, path=None, capacity=4096, max_work=CANONICAL_WORK):
+        """
+        Opens the cache, creating the SQLite file if needed.
+
+        Args:
+            path (str, optional): SQLite file to persist to. Defaults to None
+                                  (in memory only).
+            capacity (int, optional): In-memory LRU size. Defaults to 4096.
+            max_work (int, optional): Canonicalization work per puzzle.
+                                      Defaults to CANONICAL_WORK.
+        """
+        self.path = path
+        self.capacity = capacity
+        self.max_work = max_work
+        self.hits = 0
+        self.misses = 0
+        self._lru = OrderedDict()  # key -> solution string
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")  # Readers do not block the writer
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS solutions (puzzle TEXT PRIMARY KEY, solution TEXT NOT NULL)")
+            self._db.commit()
+
+    def __len__(self):
+        """Entries on disk, or in memory when there is no file."""
+        if self._db is None:
+            return len(self._lru)
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+    def keys(self, grid):
+        """
+        The keys of a puzzle, to share between get() and put() so a miss
+        canonicalizes it only once.
+        """
+        return _Keys(grid, self.max_work)
+
+    def get(self, grid, keys=None):
+        """
+        Looks up the solution of a puzzle.
+
+        Args:
+            grid (list): The puzzle, 0 for empty cells.
+            keys (optional): Its keys from keys(). Defaults to None (computed).
+
+        Returns:
+            list: The solution as a new grid, or None on a miss.
+        """
+        keys = keys or _Keys(grid, self.max_work)
+        solution = self._lookup(keys.exact)
+        if solution is not None:
+            self.hits += 1
+            return _decode(solution, len(grid))
+        if keys.canonical is not None:
+            key, transform = keys.canonical
+            solution = self._lookup(key)
+            if solution is not None:
+                self.hits += 1
+                found = transform.invert(_decode(solution, len(grid)))
+                self._store((keys.exact, _encode(found)))
+                return found
+        self.misses += 1
+        return None
+
+    def put(self, grid, solution, keys=None):
+        """Stores the solution of a puzzle, under the exact grid and its canonical form."""
+        keys = keys or _Keys(grid, self.max_work)
+        entries = [(keys.exact, _encode(solution))]
+        if keys.canonical is not None:
+            key, transform = keys.canonical
+            entries.append((key, _encode(transform.apply(solution))))
+        self._store(*entries)
+
+    def close(self):
+        """Closes the SQLite file."""
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
+
+    def _lookup(self, key):
+        with self._lock:
+            solution = self._lru.get(key)
+            if solution is not None:
+                self._lru.move_to_end(key)
+                return solution
+            if self._db is None:
+                return None
+            row = self._db.execute("SELECT solution FROM solutions WHERE puzzle = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._remember(key, row[0])
+        return row[0]
+
+    def _remember(self, key, solution):
+        with self._lock:
+            self._lru[key] = solution
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.capacity:
+                self._lru.popitem(last=False)
+
+    def _store(self, *entries):
+        """Remembers (key, solution) pairs and writes them in one transaction."""
+        for key, solution in entries:
+            self._remember(key, solution)
+        if self._db is not None:
+            with self._lock:
+                self._db.executemany("INSERT OR REPLACE INTO solutions VALUES (?, ?)", entries)
+                self._db.commit()
@@ -0,0 +1,251 @@
+"""
+Canonical form of a 9x9 puzzle under the validity-preserving transforms.
+
+Relabeling the digits, permuting rows within a band, permuting the bands,
+the same for columns and stacks, and transposing all turn a puzzle into an
+equivalent one whose solution is transformed the same way. canonical_form
+picks one representative of every such family: the grid that is smallest
+when read row by row, with empty cells (0) smallest and digits relabeled
+1, 2, 3, ... in order of first appearance.
+
+The search fixes one row at a time and keeps only the row and column
+arrangements that give the smallest grid so far. On sparse or symmetric
+puzzles many arrangements tie; those that leave the same rows to be
+placed, seen through the same columns and labels, lead to the same
+result, so only one of them is kept.
+"""
+from functools import lru_cache
+from itertools import permutations, product
+
+BOX = 3
+SIZE = BOX * BOX
+DEDUPLICATE_ABOVE = 2048  # Tied states worth the cost of _distinct
+DISTINCT_COST = 12  # Work units per state passed to _distinct, next to 1 per candidate row
+
+_BAND_ORDERS = tuple(permutations(range(BOX)))
+# Every column order that keeps stacks together: 6 stack orders x 6^3
+COLUMN_ORDERS = tuple(
+    tuple(stack * BOX + within[stack][c] for stack in stacks for c in range(BOX))
+    for stacks in _BAND_ORDERS
+    for within in product(_BAND_ORDERS, repeat=BOX)
+)
+
+
+class Transform:
+    """
+    Maps a puzzle to its canonical form and back.
+
+    canonical[r][c] == labels[grid'[rows[r]][cols[c]]], where grid' is the
+    puzzle, transposed first if 'transpose' is set.
+
+    Attributes:
+        transpose (bool): Whether the grid is transposed first.
+        rows (tuple): Source row of each canonical row.
+        cols (tuple): Source column of each canonical column.
+        labels (tuple): Canonical label of each digit, labels[0] == 0.
+    """
+    __slots__ = ("transpose", "rows", "cols", "labels")
+
+    def __init__(self, transpose, rows, cols, labels):
+        self.transpose = transpose
+        self.rows = tuple(rows)
+        self.cols = tuple(cols)
+        self.labels = tuple(labels)
+
+    def apply(self, grid):
+        """Transforms a grid (e.g. a solution) into canonical coordinates."""
+        source = _transposed(grid) if self.transpose else grid
+        return [[self.labels[source[r][c]] for c in self.cols] for r in self.rows]
+
+    def invert(self, grid):
+        """Maps a grid in canonical coordinates back to the original ones."""
+        digits = [0] * (SIZE + 1)
+        for digit, label in enumerate(self.labels):
+            digits[label] = digit
+        source = [[0] * SIZE for _ in range(SIZE)]
+        for r, row in enumerate(self.rows):
+            for c, col in enumerate(self.cols):
+                source[row][col] = digits[grid[r][c]]
+        return _transposed(source) if self.transpose else source
+
+
+def _transposed(grid):
+    return [list(column) for column in zip(*grid)]
+
+
+def canonical_form(grid, max_work=None):
+    """
+    Finds the canonical form of a 9x9 puzzle.
+
+    The cost grows with the number of tied arrangements, from well under
+    a millisecond to a few hundred on very symmetric puzzles. 'max_work'
+    bounds it: the work is counted in candidate rows tried (about 2-5 us
+    each), and the search gives up before a step that would exceed it.
+
+    Args:
+        grid (list): A 9x9 grid, 0 for empty cells.
+        max_work (int, optional): Work allowed. Defaults to None (no limit).
+
+    Returns:
+        tuple: (key, transform), or None if 'max_work' ran out. 'key' is
+               the canonical grid as an 81-character string, the same for
+               every transformed copy of the puzzle; 'transform' maps this
+               grid to it and back.
+
+    Raises:
+        ValueError: If the grid is not 9x9.
+    """
+    if len(grid) != SIZE or any(len(row) != SIZE for row in grid):
+        raise ValueError("Canonical forms are only defined for 9x9 grids.")
+    sources = (tuple(map(tuple, grid)), tuple(map(tuple, _transposed(grid))))
+
+    # The first row only depends on where its givens are, since its digits
+    # are distinct: start from the rows with the smallest given pattern
+    first = {}
+    for source, values in enumerate(sources):
+        for row, line in enumerate(values):
+            pattern, orders = _first_row_orders(sum(1 << c for c in range(SIZE) if line[c]))
+            first.setdefault(pattern, []).append((source, row, orders))
+    best = min(first)
+    work = sum(len(orders) for _, _, orders in first[best])
+    if max_work is not None and work > max_work:
+        return None
+    # A state is (source, rows placed, column order, labels, next label)
+    states = []
+    for source, row, orders in first[best]:
+        line = sources[source][row]
+        for cols in orders:
+            labels = [0] + [None] * SIZE
+            label = 1
+            for c in cols:
+                if line[c]:
+                    labels[line[c]] = label
+                    label += 1
+            states.append((source, (row,), cols, tuple(labels), label))
+    prefix = [best]
+    if len(states) > DEDUPLICATE_ABOVE:
+        work += DISTINCT_COST * len(states)
+        if max_work is not None and work > max_work:
+            return None
+        states = _distinct(states, sources)
+    for depth in range(1, SIZE):
+        work += len(states) * len(_next_rows(states[0][1]))
+        if max_work is not None and work > max_work:
+            return None
+        best = None
+        survivors = []
+        for source, rows, cols, labels, next_label in states:
+            values = sources[source]
+            for row in _next_rows(rows):
+                line = values[row]
+                new_labels = labels
+                label = next_label
+                out = []
+                for c in cols:
+                    digit = line[c]
+                    if digit and new_labels[digit] is None:
+                        if new_labels is labels:
+                            new_labels = list(labels)
+                        new_labels[digit] = label
+                        label += 1
+                    out.append(new_labels[digit])
+                out = tuple(out)
+                if best is None or out < best:
+                    best = out
+                    survivors = []
+                if out == best:
+                    survivors.append((source, rows + (row,), cols, tuple(new_labels), label))
+        prefix.append(best)
+        if depth == SIZE - 1:
+            states = survivors[:1]
+        elif len(survivors) > DEDUPLICATE_ABOVE:
+            work += DISTINCT_COST * len(survivors)
+            if max_work is not None and work > max_work:
+                return None
+            states = _distinct(survivors, sources)
+        else:
+            states = survivors
+    prefix[0] = tuple(_relabel_first(prefix[0]))
+
+    source, rows, cols, labels, label = states[0]
+    labels = list(labels)
+    for digit in range(1, SIZE + 1):  # Digits the puzzle never uses
+        if labels[digit] is None:
+            labels[digit] = label
+            label += 1
+    key = "".join(str(value) for line in prefix for value in line)
+    return key, Transform(bool(source), rows, cols, labels)
+
+
+@lru_cache(maxsize=None)
+def _first_row_orders(mask):
+    """
+    The smallest given pattern a row with givens at 'mask' can take.
+
+    Empty cells sort first, so the pattern puts the stacks with fewer
+    givens first and, within each stack, the empty columns before the
+    givens. The orders are built directly rather than by trying all of
+    COLUMN_ORDERS.
+
+    Returns:
+        tuple: (pattern, orders): the pattern as 0/1 per column, and every
+               column order that produces it.
+    """
+    counts = [sum(mask >> c & 1 for c in range(stack * BOX, stack * BOX + BOX)) for stack in range(BOX)]
+    within = []
+    for stack in range(BOX):
+        columns = range(stack * BOX, stack * BOX + BOX)
+        empty = [c for c in columns if not mask >> c & 1]
+        given = [c for c in columns if mask >> c & 1]
+        within.append([a + b for a in permutations(empty) for b in permutations(given)])
+    orders = []
+    for stacks in _BAND_ORDERS:
+        if all(counts[stacks[s]] <= counts[stacks[s + 1]] for s in range(BOX - 1)):
+            for parts in product(*(within[stack] for stack in stacks)):
+                orders.append(sum(parts, ()))
+    pattern = tuple(mask >> c & 1 for c in orders[0])
+    return pattern, tuple(orders)
+
+
+def _relabel_first(pattern):
+    """The first canonical row: its givens are labeled 1, 2, 3, ... in order."""
+    label = 0
+    for given in pattern:
+        if given:
+            label += 1
+            yield label
+        else:
+            yield 0
+
+
+def _next_rows(rows):
+    """Rows that may be placed after 'rows', keeping bands together."""
+    placed = len(rows)
+    if placed % BOX:
+        band = rows[-1] // BOX
+        return [row for row in range(band * BOX, band * BOX + BOX) if row not in rows]
+    used = {row // BOX for row in rows}
+    return [row for row in range(SIZE) if row // BOX not in used]
+
+
+def _distinct(states, sources):
+    """Drops states whose remaining rows look the same as an earlier state's."""
+    seen = set()
+    kept = []
+    for state in states:
+        source, rows, cols, labels, _ = state
+        values = sources[source]
+        remaining = []
+        for band in range(BOX):
+            lines = tuple(sorted(
+                tuple(labels[values[row][c]] if labels[values[row][c]] is not None else -values[row][c] for c in cols)
+                for row in range(band * BOX, band * BOX + BOX) if row not in rows
+            ))
+            remaining.append(lines)
+        current = rows[-1] // BOX if len(rows) % BOX else None
+        key = (remaining[current] if current is not None else None,
+               tuple(sorted(lines for band, lines in enumerate(remaining) if band != current and lines)))
+        if key not in seen:
+            seen.add(key)
+            kept.append(state)
+    return kept
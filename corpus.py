@@ -0,0 +1,293 @@
+"""
+Packed binary puzzle corpora, read through mmap.
+
+A corpus file is an 8-byte header followed by fixed-size records, so
+record i can be found without reading anything before it:
+
+    header:  b"SDKC", version (1 byte), flags (1 byte), 2 reserved bytes
+    record:  puzzle    41 bytes, 81 cells at 4 bits each, low nibble first
+             solution  41 bytes, same packing     (if flags & HAS_SOLUTION)
+             stats     9 bytes: status code (u8), search nodes (u32),
+                       seconds (f32), little-endian (if flags & HAS_STATS)
+
+Empty cells are 0. Only 9x9 puzzles fit in 4 bits per cell.
+
+Usage:
+    python corpus.py pack puzzles.txt puzzles.sdk
+    python corpus.py unpack puzzles.sdk puzzles.txt
+"""
+import argparse
+import mmap
+import struct
+import sys
+import numpy as np
+
+MAGIC = b"SDKC"
+VERSION = 1
+HAS_SOLUTION = 1
+HAS_STATS = 2
+HEADER = struct.Struct("<4sBBxx")
+STATS = struct.Struct("<BIf")
+CELLS = 81
+PACKED = (CELLS + 1) // 2  # 41 bytes per grid
+STATUSES = ("", "solved", "unsolvable", "invalid", "budget_exceeded", "cancelled")
+
+
+def pack(puzzle):
+    """
+    Packs a puzzle into 41 bytes.
+
+    Args:
+        puzzle: An 81-character line ('0' or '.' for empty cells) or 81
+                ints in row-major order.
+
+    Raises:
+        ValueError: If the puzzle is not 81 cells of 0-9.
+    """
+    if isinstance(puzzle, str):
+        text = puzzle.strip()[:CELLS]
+        if len(text) != CELLS or any(ch not in "0123456789." for ch in text):
+            raise ValueError(f"Not an 81-character puzzle: {puzzle.strip()!r}")
+        values = [0 if ch == "." else ord(ch) - 48 for ch in text]
+    else:
+        values = list(puzzle)
+        if len(values) != CELLS or any(not 0 <= value <= 9 for value in values):
+            raise ValueError("A packed puzzle needs 81 values from 0 to 9.")
+    values.append(0)  # Pads the last byte
+    return bytes(values[i] | values[i + 1] << 4 for i in range(0, CELLS + 1, 2))
+
+
+def unpack(data):
+    """Unpacks 41 bytes into an array of 81 cell values."""
+    packed = np.frombuffer(data, dtype=np.uint8, count=PACKED)
+    values = np.empty(2 * PACKED, dtype=np.uint8)
+    values[0::2] = packed & 0x0F
+    values[1::2] = packed >> 4
+    return values[:CELLS]
+
+
+def to_text(values):
+    """Formats 81 cell values as a puzzle line, '.' for empty cells."""
+    return "".join(str(value) if value else "." for value in values)
+
+
+class CorpusWriter:
+    """
+    Writes a corpus file record by record.
+
+    Use as a context manager, or call close() when done.
+    """
+    def __init__(self, path, solutions=False, stats=False):
+        """
+        Args:
+            path (str): File to create.
+            solutions (bool, optional): Store a solution with every puzzle.
+            stats (bool, optional): Store status, nodes and seconds too.
+        """
+        self.flags = (HAS_SOLUTION if solutions else 0) | (HAS_STATS if stats else 0)
+        self.count = 0
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION, self.flags))
+
+    def write(self, puzzle, solution=None, status="", nodes=0, seconds=0.0):
+        """
+        Appends one record.
+
+        Args:
+            puzzle: The puzzle, as accepted by pack().
+            solution (optional): Its solution, or None (stored as all zeros).
+            status (str, optional): One of STATUSES.
+            nodes (int, optional): Search nodes used.
+            seconds (float, optional): Solve time.
+        """
+        record = pack(puzzle)
+        if self.flags & HAS_SOLUTION:
+            record += pack(solution) if solution is not None else bytes(PACKED)
+        if self.flags & HAS_STATS:
+            record += STATS.pack(STATUSES.index(status), nodes, seconds)
+        self._file.write(record)
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Corpus:
+    """
+    A corpus file mapped into memory, indexed by record number.
+
+    Nothing is parsed up front: corpus[i] is a zero-copy memoryview of the
+    packed puzzle, and puzzles(start, stop) unpacks a range straight from
+    the mapping into a NumPy array. Views must be released before close().
+
+    Attributes:
+        path (str): The corpus file.
+        flags (int): HAS_SOLUTION and/or HAS_STATS.
+        record_size (int): Bytes per record.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # An empty file cannot be mapped
+            self._file.close()
+            raise ValueError(f"{path} is not a puzzle corpus.")
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is not a puzzle corpus.")
+        magic, version, self.flags = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} puzzle corpus.")
+        self.record_size = PACKED * (2 if self.flags & HAS_SOLUTION else 1) + (STATS.size if self.flags & HAS_STATS else 0)
+        body = len(self._map) - HEADER.size
+        if body % self.record_size:
+            self.close()
+            raise ValueError(f"{path} is truncated.")
+        self._count = body // self.record_size
+        self._view = memoryview(self._map)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        """The packed puzzle of a record, as a zero-copy memoryview."""
+        offset = self._offset(index)
+        return self._view[offset:offset + PACKED]
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self.text(index)
+
+    def puzzle(self, index):
+        """The 81 cell values of a record's puzzle."""
+        return unpack(self[index])
+
+    def text(self, index):
+        """A record's puzzle as an 81-character line."""
+        return to_text(self.puzzle(index).tolist())
+
+    def puzzles(self, start=0, stop=None):
+        """
+        Unpacks a range of puzzles at once.
+
+        Returns:
+            ndarray: (n, 81) array of uint8 cell values.
+        """
+        start, stop, _ = slice(start, stop).indices(self._count)
+        n = max(0, stop - start)
+        records = np.frombuffer(self._map, dtype=np.uint8, count=n * self.record_size,
+                                offset=HEADER.size + start * self.record_size)
+        packed = records.reshape(n, self.record_size)[:, :PACKED]
+        values = np.empty((n, 2 * PACKED), dtype=np.uint8)
+        values[:, 0::2] = packed & 0x0F
+        values[:, 1::2] = packed >> 4
+        return values[:, :CELLS]
+
+    def solution(self, index):
+        """A record's solution as 81 values, or None if it has none."""
+        if not self.flags & HAS_SOLUTION:
+            return None
+        offset = self._offset(index) + PACKED
+        values = unpack(self._view[offset:offset + PACKED])
+        return values if values.any() else None
+
+    def stats(self, index):
+        """
+        A record's solve statistics.
+
+        Returns:
+            tuple: (status, nodes, seconds), or None if the corpus has none.
+        """
+        if not self.flags & HAS_STATS:
+            return None
+        offset = self._offset(index) + self.record_size - STATS.size
+        code, nodes, seconds = STATS.unpack_from(self._map, offset)
+        return STATUSES[code], nodes, seconds
+
+    def close(self):
+        if hasattr(self, "_view"):
+            self._view.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _offset(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("corpus index out of range")
+        return HEADER.size + index * self.record_size
+
+
+def is_corpus(path):
+    """True if 'path' starts with the corpus magic bytes."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def text_to_corpus(lines, path):
+    """
+    Packs puzzle lines into a new corpus file.
+
+    Empty lines and lines starting with '#' are skipped.
+
+    Returns:
+        int: Number of puzzles written.
+    """
+    with CorpusWriter(path) as writer:
+        for line in lines:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                writer.write(line)
+    return writer.count
+
+
+def corpus_to_text(path, out):
+    """Writes every puzzle of a corpus to a text stream, one per line."""
+    with Corpus(path) as corpus:
+        for text in corpus:
+            out.write(text + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert between puzzle text files and packed corpora.")
+    parser.add_argument("command", choices=("pack", "unpack"))
+    parser.add_argument("source", help="input file ('-' for stdin when packing)")
+    parser.add_argument("target", help="output file ('-' for stdout when unpacking)")
+    args = parser.parse_args(argv)
+
+    if args.command == "pack":
+        stream = sys.stdin if args.source == "-" else open(args.source)
+        try:
+            count = text_to_corpus(stream, args.target)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        print(f"Packed {count} puzzles.", file=sys.stderr)
+    else:
+        out = sys.stdout if args.target == "-" else open(args.target, "w")
+        try:
+            corpus_to_text(args.source, out)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+
+if __name__ == "__main__":
+    main()
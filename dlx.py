@@ -0,0 +1,217 @@
+"""
+Dancing Links (Algorithm X) exact-cover solver.
+
+Sudoku is an exact-cover problem: on a 9x9 board each of the 729
+candidates (cell, value) covers four of 324 constraints (the cell is
+filled, and the value appears once in its row, its column and its box),
+and a solution picks 81 candidates that cover every constraint exactly
+once. Larger boards work the same way with more rows and columns.
+
+The sparse exact-cover matrix is kept as parallel int arrays of left, right,
+up and down links, so it is built once and reused: the givens and every
+search step are covered on the way down and uncovered in reverse on the
+way back, which leaves the structure as it was for the next puzzle.
+"""
+import threading
+from array import array
+from board import STANDARD, board_for
+
+
+class DancingLinks:
+    """
+    The exact-cover matrix of a Sudoku board and the Algorithm X search.
+
+    Node 0 is the root, nodes 1 to 4 * cells are the column headers and
+    the four nodes of candidate r = cell * size + value - 1 start at
+    first + 4 * r. A solve mutates the links, so one instance must not be
+    used by two threads at once; see shared_solver().
+
+    Attributes:
+        board (Board): Geometry the matrix was built for.
+        nodes (int): Candidates tried by the last solve.
+    """
+    def __init__(self, board=STANDARD):
+        self.board = board
+        columns = 4 * board.cells  # Cell, row-value, column-value and box-value constraints
+        self.first = columns + 1
+        size = self.first + 4 * board.cells * board.size
+        self.left = array("i", range(-1, size - 1))
+        self.right = array("i", range(1, size + 1))
+        self.up = array("i", range(size))
+        self.down = array("i", range(size))
+        self.column = array("i", range(size))
+        self.count = array("i", [0] * (columns + 1))  # Live nodes per column
+        self.nodes = 0
+        self.left[0] = columns
+        self.right[columns] = 0
+        for row in range(board.cells * board.size):
+            first = self.first + 4 * row
+            for k, col in enumerate(self.candidate_columns(*divmod(row, board.size))):
+                node = first + k
+                self.left[node] = first + (k - 1) % 4
+                self.right[node] = first + (k + 1) % 4
+                self.column[node] = col
+                self.up[node] = self.up[col]  # Append at the bottom of the column
+                self.down[node] = col
+                self.down[self.up[col]] = node
+                self.up[col] = node
+                self.count[col] += 1
+
+    def candidate_columns(self, cell, v):
+        """The four constraint columns covered by value v + 1 in a cell."""
+        board = self.board
+        size, cells = board.size, board.cells
+        return (
+            1 + cell,
+            1 + cells + board.row_of[cell] * size + v,
+            1 + 2 * cells + board.col_of[cell] * size + v,
+            1 + 3 * cells + board.box_of[cell] * size + v,
+        )
+
+    def cover(self, col):
+        """Unlinks a column and every row that meets it."""
+        left, right, up, down = self.left, self.right, self.up, self.down
+        column, count = self.column, self.count
+        right[left[col]] = right[col]
+        left[right[col]] = left[col]
+        i = down[col]
+        while i != col:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                count[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, col):
+        """Relinks a column, exactly undoing cover(col)."""
+        left, right, up, down = self.left, self.right, self.up, self.down
+        column, count = self.column, self.count
+        i = up[col]
+        while i != col:
+            j = left[i]
+            while j != i:
+                count[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[col]] = col
+        left[right[col]] = col
+
+    def _select(self, node):
+        """Covers the columns of the other nodes in a chosen row."""
+        j = self.right[node]
+        while j != node:
+            self.cover(self.column[j])
+            j = self.right[j]
+
+    def _deselect(self, node):
+        """Undoes _select(node)."""
+        j = self.left[node]
+        while j != node:
+            self.uncover(self.column[j])
+            j = self.left[j]
+
+    def solve(self, cells, limit=1, budget=None):
+        """
+        Searches for solutions of a puzzle.
+
+        Args:
+            cells (list): The cell values in row-major order, 0 for empty.
+            limit (int, optional): Stop after this many solutions.
+                                   Defaults to 1.
+            budget (SolveBudget, optional): Charged once per candidate
+                                            tried; BudgetExceeded propagates
+                                            after the links are restored.
+
+        Returns:
+            tuple: (count, solution) where count is the number of solutions
+                   found, at most 'limit', and solution is the first one as
+                   a flat list of values, or None.
+        """
+        self.nodes = 0
+        size = self.board.size
+        givens = []
+        seen = set()
+        for cell, value in enumerate(cells):
+            if value:
+                columns = self.candidate_columns(cell, value - 1)
+                if seen.intersection(columns):
+                    return 0, None  # Two givens clash
+                seen.update(columns)
+                givens.append(self.first + 4 * (cell * size + value - 1))
+        for node in givens:
+            self.cover(self.column[node])
+            self._select(node)
+        try:
+            return self._search(cells, limit, budget)
+        finally:
+            for node in reversed(givens):
+                self._deselect(node)
+                self.uncover(self.column[node])
+
+    def _search(self, cells, limit, budget):
+        """Algorithm X with the smallest column first, on an explicit stack."""
+        right, down, column, count = self.right, self.down, self.column, self.count
+        first, size = self.first, self.board.size
+        stack = []  # Row node chosen at each level
+        found = 0
+        solution = None
+        try:
+            while True:
+                if right[0] == 0:  # Every constraint is covered
+                    found += 1
+                    if solution is None:
+                        solution = list(cells)
+                        for node in stack:
+                            cell, value = divmod((node - first) // 4, size)
+                            solution[cell] = value + 1
+                    if found >= limit:
+                        return found, solution
+                    node = None  # Look for the next solution
+                else:
+                    col = best = right[0]
+                    smallest = count[col]
+                    while col and smallest > 1:
+                        if count[col] < smallest:
+                            best, smallest = col, count[col]
+                        col = right[col]
+                    self.cover(best)
+                    node = down[best]
+                    if node == best:
+                        self.uncover(best)
+                        node = None
+                while node is None:  # Backtrack to the next untried row
+                    if not stack:
+                        return found, solution
+                    previous = stack.pop()
+                    self._deselect(previous)
+                    node = down[previous]
+                    if node == column[previous]:
+                        self.uncover(node)
+                        node = None
+                stack.append(node)
+                self._select(node)
+                self.nodes += 1
+                if budget is not None:
+                    budget.charge()  # After the push, so the finally below restores this level too
+        finally:
+            while stack:  # Only left over when stopping early
+                node = stack.pop()
+                self._deselect(node)
+                self.uncover(column[node])
+
+
+_local = threading.local()
+
+
+def shared_solver(box=3):
+    """The DancingLinks of the calling thread for a box size, built on first use."""
+    solvers = getattr(_local, "solvers", None)
+    if solvers is None:
+        solvers = _local.solvers = {}
+    if box not in solvers:
+        solvers[box] = DancingLinks(board_for(box))
+    return solvers[box]
@@ -1,18 +1,40 @@
+import os
+import sys
 import tkinter as tk
 from tkinter import messagebox, ttk
-from main import Sudoku
+from main import Sudoku, reference_solution
+from budget import SolveBudget
+from pool import PuzzlePool
+import threading
 import time
+
+POOL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "puzzle_pool.json")
 class SudokuGUI:
-    def __init__(self, root):
+    def __init__(self, root, box=3):
         self.root = root
         self.root.title("Sudoku Solver")
-        self.entries = [[None for _ in range(9)] for _ in range(9)]
+        self.box = box
+        self.size = box * box
+        self.entries = [[None for _ in range(self.size)] for _ in range(self.size)]
+        self.entry_cells = {}  # Entry widget -> (row, col)
+        self.givens = None  # Puzzle being played in user input mode
         self.create_title()
         self.create_grid()
         self.create_buttons()
         self.create_difficulty_dropdown()
         self.create_history_display()
+        self.create_solve_controls()
         self.mode = "solver"  # Modes: solver, user_input
+        self.solve_thread = None
+        self.budget = None
+        Sudoku.puzzle_pool = PuzzlePool(POOL_FILE).start()  # Keeps "Generate" instant
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+    def close(self):
+        if self.budget is not None:
+            self.budget.cancel()
+        Sudoku.puzzle_pool.stop()  # Saves the pool for the next start
+        self.root.destroy()
 
     def create_title(self):
         title = tk.Label(self.root, text="Sudoku Solver", font=('Arial', 24, 'bold'))
@@ -21,23 +43,42 @@ class SudokuGUI:
     def create_grid(self):
         grid_frame = tk.Frame(self.root, bg='black')
         grid_frame.grid(row=1, column=0, columnspan=9, padx=10, pady=10)
-        for row in range(9):
-            for col in range(9):
-                entry = tk.Entry(grid_frame, width=2, font=('Arial', 18), justify='center', bd=1, relief='solid')
+        for row in range(self.size):
+            for col in range(self.size):
+                entry = tk.Entry(grid_frame, width=2, font=('Arial', 18 if self.size <= 9 else 11), justify='center', bd=1, relief='solid')
                 entry.grid(row=row, column=col, padx=1, pady=1)
                 entry.bind('<KeyRelease>', self.on_cell_change)
                 self.entries[row][col] = entry
+                self.entry_cells[entry] = (row, col)
+        self.entry_bg = self.entries[0][0].cget('bg')
 
     def on_cell_change(self, event):
-        if event.char.isdigit():
-            self.validate_user_solution()
+        if self.mode == "user_input" and event.widget in self.entry_cells:
+            self.validate_cell(*self.entry_cells[event.widget])
+
+    def validate_cell(self, row, col):
+        """Highlights one cell against the cached solution of the current puzzle."""
+        entry = self.entries[row][col]
+        value = entry.get().strip()
+        solution = reference_solution(self.givens) if self.givens else None
+        if solution is None or value == '':
+            entry.config(bg=self.entry_bg)
+        elif value == str(solution[row * self.size + col]):
+            entry.config(bg='lightgreen')
+        else:
+            entry.config(bg='salmon')
+
+    def reset_highlights(self):
+        for row in range(self.size):
+            for col in range(self.size):
+                self.entries[row][col].config(bg=self.entry_bg)
 
     def create_buttons(self):
         button_frame = tk.Frame(self.root)
         button_frame.grid(row=10, column=0, columnspan=9, pady=10)
 
-        solve_button = tk.Button(button_frame, text="Solve", command=self.solve, font=('Arial', 14), bg='lightblue')
-        solve_button.grid(row=0, column=0, padx=5)
+        self.solve_button = tk.Button(button_frame, text="Solve", command=self.solve, font=('Arial', 14), bg='lightblue')
+        self.solve_button.grid(row=0, column=0, padx=5)
 
         clear_button = tk.Button(button_frame, text="Clear", command=self.clear, font=('Arial', 14), bg='lightblue')
         clear_button.grid(row=0, column=1, padx=5)
@@ -85,11 +126,36 @@ class SudokuGUI:
         next_button = tk.Button(history_frame, text="Next", command=self.next_grid_step, font=('Arial', 14), bg='lightblue')
         next_button.grid(row=0, column=4, padx=5)
 
+    def create_solve_controls(self):
+        solve_frame = tk.Frame(self.root)
+        solve_frame.grid(row=13, column=0, columnspan=9, pady=10)
+
+        tk.Label(solve_frame, text="Time limit (s):", font=('Arial', 12)).grid(row=0, column=0, padx=5)
+        self.time_limit_entry = tk.Entry(solve_frame, width=6, font=('Arial', 12))
+        self.time_limit_entry.grid(row=0, column=1, padx=5)
+
+        tk.Label(solve_frame, text="Node limit:", font=('Arial', 12)).grid(row=0, column=2, padx=5)
+        self.node_limit_entry = tk.Entry(solve_frame, width=8, font=('Arial', 12))
+        self.node_limit_entry.grid(row=0, column=3, padx=5)
+
+        self.cancel_button = tk.Button(solve_frame, text="Cancel", command=self.cancel_solve, font=('Arial', 14), bg='lightblue', state=tk.DISABLED)
+        self.cancel_button.grid(row=0, column=4, padx=5)
+
+        self.progress_label = tk.Label(solve_frame, text="", font=('Arial', 12))
+        self.progress_label.grid(row=1, column=0, columnspan=5, pady=5)
+
+    def read_budget(self):
+        """Builds a SolveBudget from the limit fields; blank fields mean no limit."""
+        time_limit = self.time_limit_entry.get().strip()
+        node_limit = self.node_limit_entry.get().strip()
+        return SolveBudget(max_nodes=int(node_limit) if node_limit else None,
+                           time_limit=float(time_limit) if time_limit else None)
+
     def get_board(self):
         board = []
-        for row in range(9):
+        for row in range(self.size):
             current_row = []
-            for col in range(9):
+            for col in range(self.size):
                 value = self.entries[row][col].get()
                 if value == '':
                     current_row.append(0)
@@ -99,39 +165,71 @@ class SudokuGUI:
         return board
 
     def set_board(self, board):
-        for row in range(9):
-            for col in range(9):
+        for row in range(self.size):
+            for col in range(self.size):
                 self.entries[row][col].delete(0, tk.END)
                 if board[row][col] != 0:
                     self.entries[row][col].insert(0, str(board[row][col]))
 
     def solve(self):
+        if self.solve_thread is not None:
+            return  # Already solving
+        try:
+            self.budget = self.read_budget()
+        except ValueError:
+            messagebox.showerror("Error", "Invalid time or node limit.")
+            return
         board = self.get_board()
-        self.sudoku = Sudoku(board)
-        start_time = time.time()
-        if self.sudoku.solve_sudoku():
-            end_time = time.time()
-            print(f"Solved in {end_time - start_time:.4f} seconds.")
+        self.solving = Sudoku(board, history="delta")
+        self.solve_start = time.time()
+        # The search runs off the Tk thread; poll_solve picks up the result
+        self.solve_thread = threading.Thread(target=self.solving.solve_sudoku, args=(self.budget,), daemon=True)
+        self.solve_thread.start()
+        self.solve_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.root.after(100, self.poll_solve)
+
+    def poll_solve(self):
+        elapsed = time.time() - self.solve_start
+        self.progress_label.config(text=f"Nodes explored: {self.budget.nodes}   Elapsed: {elapsed:.1f} s")
+        if self.solve_thread.is_alive():
+            self.root.after(100, self.poll_solve)
+            return
+        self.solve_thread = None
+        self.solve_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        self.sudoku = self.solving
+        status = self.sudoku.status
+        if status == "solved":
+            print(f"Solved in {elapsed:.4f} seconds.")
             self.set_board(self.sudoku.grid)
+        elif status == "budget_exceeded":
+            messagebox.showwarning("Budget exceeded", "The time or node limit was reached before a solution was found.")
+        elif status == "cancelled":
+            self.progress_label.config(text=f"Cancelled after {self.budget.nodes} nodes.")
         else:
             messagebox.showerror("Error", "No solution found.")
         self.show_history()
 
+    def cancel_solve(self):
+        if self.budget is not None:
+            self.budget.cancel()
+
     def clear(self):
-        for row in range(9):
-            for col in range(9):
+        for row in range(self.size):
+            for col in range(self.size):
                 self.entries[row][col].delete(0, tk.END)
 
     def generate(self):
         difficulty = self.difficulty.get()
-        self.sudoku = Sudoku([[0]*9 for _ in range(9)])
+        self.sudoku = Sudoku([[0]*self.size for _ in range(self.size)], history="delta")
         self.sudoku.generate_puzzle(difficulty)
         self.set_board(self.sudoku.grid)
         if self.mode == "user_input":
-            # Create a copy of the user's board to solve
-            self.correct_board = [row[:] for row in self.get_board()]
-            self.correct_sudoku = Sudoku(self.correct_board)
-            
+            # Solve once up front; keystrokes are checked against the cached solution
+            self.givens = tuple(value for row in self.get_board() for value in row)
+            reference_solution(self.givens)
+            self.reset_highlights()
 
     def show_domains(self):
         if hasattr(self, 'sudoku'):
@@ -139,22 +237,22 @@ class SudokuGUI:
             self.domains_window = tk.Toplevel(self.root)
             self.domains_window.title("Domains History")
             self.domains_window.geometry("800x600")  # Set the window size
-            self.domain_labels = [[tk.Label(self.domains_window, text="", width=20, font=('Arial', 8), justify='center') for _ in range(9)] for _ in range(9)]
-            for row in range(9):
-                for col in range(9):
+            self.domain_labels = [[tk.Label(self.domains_window, text="", width=20, font=('Arial', 8), justify='center') for _ in range(self.size)] for _ in range(self.size)]
+            for row in range(self.size):
+                for col in range(self.size):
                     self.domain_labels[row][col].grid(row=row, column=col, padx=15, pady=15)  # Increase padding
             self.step_label = tk.Label(self.domains_window, text=f"Step: {self.current_domain_step + 1}/{len(self.sudoku.domains_history)}", font=('Arial', 14))
-            self.step_label.grid(row=10, column=0, columnspan=9, pady=10)
+            self.step_label.grid(row=self.size + 1, column=0, columnspan=self.size, pady=10)
             self.update_domain_display()
             prev_button = tk.Button(self.domains_window, text="Previous", command=self.prev_domain_step)
-            prev_button.grid(row=11, column=0, padx=5, pady=5)
+            prev_button.grid(row=self.size + 2, column=0, padx=5, pady=5)
             next_button = tk.Button(self.domains_window, text="Next", command=self.next_domain_step)
-            next_button.grid(row=11, column=1, padx=5, pady=5)
+            next_button.grid(row=self.size + 2, column=1, padx=5, pady=5)
 
     def update_domain_display(self):
         if self.sudoku:
-            for row in range(9):
-                for col in range(9):
+            for row in range(self.size):
+                for col in range(self.size):
                     domain = self.sudoku.domains_history[self.current_domain_step][row][col]
                     self.domain_labels[row][col].config(text=str(sorted(domain)))
             self.step_label.config(text=f"Step: {self.current_domain_step + 1}/{len(self.sudoku.domains_history)}")
@@ -176,8 +274,8 @@ class SudokuGUI:
 
     def update_grid_display(self):
         if self.sudoku:
-            for row in range(9):
-                for col in range(9):
+            for row in range(self.size):
+                for col in range(self.size):
                     self.entries[row][col].delete(0, tk.END)
                     value = self.sudoku.grid_history[self.current_grid_step][row][col]
                     if value != 0:
@@ -207,25 +305,26 @@ class SudokuGUI:
 
     def user_input_mode(self):
         self.mode = "user_input"
+        self.givens = None
         self.clear()
+        self.reset_highlights()
         messagebox.showinfo("User Input Mode", "You can now enter your solution. ")
 
 
     def validate_user_solution(self, event=None):
         if self.mode == "user_input":
+            if self.givens is None:
+                messagebox.showerror("Validation", "Generate a puzzle first.")
+                return
             user_board = self.get_board()
-            self.sudoku = Sudoku(user_board)
-            
-            if self.correct_sudoku.solve_sudoku():
-                consistent = True
-                for i in range(len(user_board)):
-                    for j in range(len(user_board[i])):
-                        if user_board[i][j] != 0 and user_board[i][j] != self.correct_board[i][j]:
-                            consistent = False
-                            break
-                    if not consistent:
-                        break
-                
+            self.sudoku = Sudoku(user_board, history="delta")
+            solution = reference_solution(self.givens)
+
+            if solution is not None:
+                consistent = all(
+                    user_board[i][j] == 0 or user_board[i][j] == solution[i * self.size + j]
+                    for i in range(self.size) for j in range(self.size)
+                )
                 if consistent:
                     messagebox.showinfo("Validation", "Your solution is correct!")
                 else:
@@ -235,5 +334,5 @@ class SudokuGUI:
 
 if __name__ == "__main__":
     root = tk.Tk()
-    gui = SudokuGUI(root)
+    gui = SudokuGUI(root, box=int(sys.argv[1]) if len(sys.argv) > 1 else 3)  # e.g. "python gui.py 4" for 16x16
     root.mainloop()
\ No newline at end of file
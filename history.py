@@ -0,0 +1,120 @@
+"""
+Step history of a solve, for stepping through it in the GUI.
+
+A HistoryRecorder runs in one of three modes:
+
+- "off": nothing is kept. This is the default for batch solving.
+- "full": a complete copy of the grid and domain masks at every step.
+- "delta": only the cells that changed since the previous step, plus a
+  full keyframe every 'keyframe_interval' steps. Any step is rebuilt from
+  the nearest keyframe before it.
+"""
+from collections.abc import Sequence
+from math import isqrt
+from board import mask_values
+
+HISTORY_MODES = ("off", "full", "delta")
+
+
+class HistoryRecorder:
+    """
+    Records the grid and domains after each propagation or assignment.
+
+    Attributes:
+        mode (str): One of "off", "full" or "delta".
+        keyframe_interval (int): Steps between full snapshots in delta mode.
+        grids (Sequence): Step n as a list of rows of ints.
+        domains (Sequence): Step n as a list of rows of sets.
+    """
+    def __init__(self, mode="off", keyframe_interval=32):
+        if mode not in HISTORY_MODES:
+            raise ValueError(f"Unknown history mode {mode!r}, expected one of {HISTORY_MODES}.")
+        self.mode = mode
+        self.keyframe_interval = keyframe_interval
+        self.enabled = mode != "off"
+        self._steps = []  # full: (values, masks); delta: keyframe or list of changes
+        self._last = None  # (values, masks) of the latest step, for diffing
+        self._cached = None  # (step, values, masks) of the latest rebuilt step
+        self.grids = _StepView(self, _grid_of)
+        self.domains = _StepView(self, _domains_of)
+
+    def __len__(self):
+        return len(self._steps)
+
+    def record(self, grid, masks):
+        """
+        Adds a step.
+
+        Args:
+            grid (list): The current grid.
+            masks (array): The current domain masks, indexed by cell.
+        """
+        if not self.enabled:
+            return
+        values = [value for row in grid for value in row]
+        masks = list(masks)
+        if self.mode == "full" or len(self._steps) % self.keyframe_interval == 0:
+            self._steps.append((values, masks))
+        else:
+            last_values, last_masks = self._last
+            self._steps.append([
+                (cell, values[cell], masks[cell]) for cell in range(len(values))
+                if values[cell] != last_values[cell] or masks[cell] != last_masks[cell]
+            ])
+        self._last = (values, masks)
+
+    def state(self, step):
+        """
+        Rebuilds a step.
+
+        Args:
+            step (int): Index of the step, negative values count from the end.
+
+        Returns:
+            tuple: (values, masks), two flat lists indexed by cell.
+        """
+        if step < 0:
+            step += len(self._steps)
+        if not 0 <= step < len(self._steps):
+            raise IndexError("history step out of range")
+        if self.mode == "full":
+            return self._steps[step]
+        # Walk forward from the cached step when seeking ahead in the same block
+        keyframe = step - step % self.keyframe_interval
+        cached = self._cached
+        if cached is not None and keyframe <= cached[0] <= step:
+            start, values, masks = cached[0], list(cached[1]), list(cached[2])
+        else:
+            start = keyframe
+            values, masks = (list(part) for part in self._steps[keyframe])
+        for delta in self._steps[start + 1:step + 1]:
+            for cell, value, mask in delta:
+                values[cell] = value
+                masks[cell] = mask
+        self._cached = (step, values, masks)
+        return values, masks
+
+
+class _StepView(Sequence):
+    """Read-only sequence over the recorded steps."""
+    def __init__(self, recorder, build):
+        self._recorder = recorder
+        self._build = build
+
+    def __len__(self):
+        return len(self._recorder)
+
+    def __getitem__(self, step):
+        if isinstance(step, slice):
+            return [self[i] for i in range(*step.indices(len(self)))]
+        return self._build(*self._recorder.state(step))
+
+
+def _grid_of(values, masks):
+    size = isqrt(len(values))
+    return [values[r * size:(r + 1) * size] for r in range(size)]
+
+
+def _domains_of(values, masks):
+    size = isqrt(len(values))
+    return [[set(mask_values(masks[r * size + c])) for c in range(size)] for r in range(size)]
@@ -1,17 +1,54 @@
-from dokusan import generators
-import copy
+import time
+from collections import deque
+from functools import lru_cache
+from math import isqrt
 import numpy as np
+from budget import BudgetExceeded
+from board import DomainStore, bit, board_for, box_of_size, is_single
+from dlx import shared_solver
+from history import HistoryRecorder
+from mrv import MRVIndex
+from pool import generate
+from propagation import PropagationPipeline
+
+# "backtrack" is arc consistency with MRV search, "dlx" is Dancing Links
+STRATEGIES = ("backtrack", "dlx")
+
+
 class Sudoku:
     """
     Represents a Sudoku puzzle.
 
     Attributes:
-        grid (list): A 9x9 list representing the Sudoku grid.
-                    0 indicates an empty cell.
-        domains (list): A 9x9 list of sets, where each set represents
-                       the possible values for a cell in the grid.
+        grid (list): A size x size list representing the Sudoku grid,
+                    9x9 by default. 0 indicates an empty cell.
+        board (Board): Shared unit and peer tables for the grid's box size.
+        size (int): Rows of the grid (9 for the standard board).
+        domains (list): A size x size list of sets, where each set represents
+                       the possible values for a cell in the grid. This is
+                       a read-only view built from 'store'.
+        store (DomainStore): The candidate values of every cell as
+                             bitmasks in one flat array.
+        trail (list): Undo log of every domain change and grid write,
+                      popped back to a saved length on backtrack.
+        mrv_index (MRVIndex): Empty cells by domain size and degree, kept
+                              in step with the trail; built by the first
+                              get_mrv call.
+        history (HistoryRecorder): The recorded solving steps.
+        grid_history (Sequence): Grid at each recorded step.
+        domains_history (Sequence): Domains at each recorded step.
+        status (str): Outcome of the last solve_sudoku: "solved",
+                      "unsolvable", "budget_exceeded" or "cancelled", or
+                      None before the first solve.
+        puzzle_pool (PuzzlePool): Class-wide pool generate_puzzle serves
+                                  from, or None to always generate.
+        solution_cache (SolutionCache): Class-wide cache solve_sudoku
+                                        answers from and adds to, or None.
     """
-    def __init__(self, grid=None):
+    puzzle_pool = None
+    solution_cache = None
+
+    def __init__(self, grid=None, history="off", stats=None, hooks=None, rules=None, box=None):
         """
        Initializes the Sudoku grid and domains.
 
@@ -19,28 +56,75 @@ class Sudoku:
            grid (list, optional): A pre-filled Sudoku grid. If not
                                   provided, a new empty grid is created.
                                   Defaults to None.
+           history (str, optional): How solving steps are recorded: "off",
+                                    "full" or "delta". Defaults to "off".
+           stats (SolverStats, optional): Counters to add the solver's work
+                                          to. Defaults to None (not counted).
+           hooks (SolverHooks, optional): Callbacks fired on assignment,
+                                          propagation and backtrack.
+                                          Defaults to None.
+           rules (list, optional): Propagation rules to run after arc
+                                   consistency, by name (see
+                                   propagation.RULES) or as Rule objects.
+                                   Defaults to None (arc consistency only).
+           box (int, optional): Box size n of an n*n by n*n board, e.g. 4
+                                for 16x16. Defaults to None, which takes
+                                it from the grid, or 3 without a grid.
        """
+        if grid:
+            self.board = board_for(box_of_size(len(grid)))
+            if box is not None and box != self.board.box:
+                raise ValueError(f"A {len(grid)}x{len(grid)} grid does not have box size {box}.")
+        else:
+            self.board = board_for(box or 3)
+        self.size = self.board.size
         # Initialize the Sudoku grid and domains
-        self.grid = grid if grid else [[0] * 9 for _ in range(9)]
-        self.domains = [[set(range(1, 10)) for _ in range(9)] for _ in range(9)]
+        self.grid = grid if grid else [[0] * self.size for _ in range(self.size)]
+        self.store = DomainStore(board=self.board)
         self.initialize_domains()
-        self.arcs = self.define_arcs()  # Get all arcs
-        self.grid_history = [copy.deepcopy(self.grid)]
-        self.domains_history = [copy.deepcopy(self.domains)]
+        self.arcs = self.define_arcs()  # Shared by every instance
+        self.history = HistoryRecorder(history)
+        self.stats = stats
+        self.hooks = hooks
+        self.pipeline = PropagationPipeline(rules) if rules else None
+        self._queued = None  # AC-3 arc flags, reused by every _arc_consistency run
+        self.budget = None
+        self.status = None
+        self.record_step()
+
+    @property
+    def domains(self):
+        """The domains as a size x size list of sets, rebuilt from the bitmasks."""
+        return self.store.as_sets()
+
+    @property
+    def grid_history(self):
+        return self.history.grids
+
+    @property
+    def domains_history(self):
+        return self.history.domains
+
+    def record_step(self):
+        """Records the current grid and domains, unless history is off."""
+        if self.history.enabled:
+            if self.stats is None:
+                self.history.record(self.grid, self.store.masks)
+            else:
+                start = time.perf_counter()
+                self.history.record(self.grid, self.store.masks)
+                self.stats.history_time += time.perf_counter() - start
 
     def initialize_domains(self):
         """
         Initializes the domains for each cell in the grid.
 
         - If a cell has a pre-filled value, its domain is set to that value only.
-        - If a cell is empty, its domain is set to all possible values (1-9).
+        - If a cell is empty, its domain is set to all possible values (1-size).
         """
-        for i in range(9):
-            for j in range(9):
-                if self.grid[i][j] != 0:
-                    self.domains[i][j] = {self.grid[i][j]}
-                else:
-                    self.domains[i][j] = set(range(1, 10))
+        self.store.load(self.grid)
+        self.trail = []
+        self.mrv_index = None
 
     def define_arcs(self):
         """
@@ -50,29 +134,15 @@ class Sudoku:
         cannot be the same. This ensures that each row, column, and 3x3 subgrid
         has unique values.
 
+        The arcs come from the shared Board and are computed from its peer
+        table on access, so even a 25x25 board stores no arc list.
+
         Returns:
-            list: A list of tuples representing the arcs in the grid.
-        """
-        arcs = []
-        for i in range(9):
-            for j in range(9):
-                for k in range(9):
-                    if j != k:
-                        arcs.append(((i, j), (i, k)))
-                for k in range(9):
-                    if i != k:
-                        arcs.append(((i, j), (k, j)))
-        for box_row in range(3):
-            for box_col in range(3):
-                for i in range(3):
-                    for j in range(3):
-                        for k in range(3):
-                            for l in range(3):
-                                if (i, j) != (k, l):
-                                    arcs.append(((box_row * 3 + i, box_col * 3 + j), (box_row * 3 + k, box_col * 3 + l)))
-        return arcs
-
-    def apply_arc_consistency(self):
+            Arcs: A sequence of (i, j) pairs of cell indices (row * size + col).
+        """
+        return self.board.arcs
+
+    def apply_arc_consistency(self, cell=None):
         """
         Applies Arc Consistency to the Sudoku grid.
 
@@ -80,16 +150,90 @@ class Sudoku:
         already exists in a related cell (connected by an arc). This reduces
         the number of possible values for each cell, potentially leading to
         faster solving.
+
+        This is AC-3: arcs wait in a queue and, whenever revise(xi, xj)
+        shrinks the domain of xi, only the arcs (xk, xi) pointing into xi
+        are queued again instead of sweeping the whole arc list. When
+        propagation rules are enabled they run once the queue is empty,
+        and arc consistency follows up on every cell they changed.
+
+        Args:
+            cell (tuple, optional): Coordinates (row, col) of a cell whose
+                                    domain just changed. If given, only the
+                                    arcs from its neighbours are queued to
+                                    start with. Defaults to None, which
+                                    queues every arc.
+
+        Returns:
+            bool: False if some domain became empty, True otherwise.
         """
-        changed = True
-        while changed:
-            changed = False
-            for (xi, xj) in self.arcs:
-                if self.revise(xi, xj):
-                    changed = True
+        stats = self.stats
+        if stats is not None:
+            start = time.perf_counter()
+        consistent = self._arc_consistency(None if cell is None else [cell[0] * self.size + cell[1]])
+        while consistent and self.pipeline is not None:
+            changed = self.pipeline.run(self)
+            if not changed:
+                consistent = changed is not None  # None means a rule found a contradiction
+                break
+            consistent = self._arc_consistency(changed)
         self.update_grid()
-        self.grid_history.append(copy.deepcopy(self.grid))
-        self.domains_history.append(copy.deepcopy(self.domains))
+        if stats is not None:
+            stats.propagation_time += time.perf_counter() - start
+        self.record_step()
+        if self.hooks is not None and self.hooks.on_propagate is not None:
+            self.hooks.on_propagate(self, consistent)
+        return consistent
+
+    def _arc_consistency(self, cells):
+        """
+        Runs the AC-3 queue.
+
+        Args:
+            cells (iterable): Indices of the cells whose domains changed, or
+                              None to start from every arc.
+
+        Returns:
+            bool: False if some domain became empty, True otherwise.
+        """
+        masks = self.store.masks
+        peers = self.board.peers
+        n = self.board.cells
+        if cells is None:
+            queue = deque(self.arcs)
+        else:
+            queue = deque((xk, xj) for xj in cells for xk in peers[xj])
+        # Arc (i, j) is queued[i * n + j]. Allocated once per Sudoku and all
+        # zero between runs: only the flags of queued arcs are ever set, and
+        # each is cleared again when its arc leaves the queue.
+        queued = self._queued
+        if queued is None:
+            queued = self._queued = bytearray(n * n)
+        for xi, xj in queue:
+            queued[xi * n + xj] = 1
+        consistent = True
+        revisions = removals = 0
+        try:
+            while queue:
+                xi, xj = queue.popleft()
+                queued[xi * n + xj] = 0
+                revisions += 1
+                if self._revise(xi, xj):
+                    removals += 1
+                    if not masks[xi]:
+                        consistent = False
+                        break
+                    for xk in peers[xi]:
+                        if xk != xj and not queued[xk * n + xi]:
+                            queue.append((xk, xi))
+                            queued[xk * n + xi] = 1
+        finally:
+            for xi, xj in queue:  # Arcs left when a domain emptied
+                queued[xi * n + xj] = 0
+        if self.stats is not None:
+            self.stats.revise_calls += revisions
+            self.stats.removals += removals
+        return consistent
 
     def revise(self, xi, xj):
         """
@@ -106,27 +250,47 @@ class Sudoku:
         Returns:
             bool: True if the domain of xi was revised, False otherwise.
         """
-        revised = False
-        for value in list(self.domains[xi[0]][xi[1]]):
-            if not any(value != v for v in self.domains[xj[0]][xj[1]]):
-                self.domains[xi[0]][xi[1]].remove(value)
-                revised = True
-        return revised
+        return self._revise(xi[0] * self.size + xi[1], xj[0] * self.size + xj[1])
+
+    def _revise(self, i, j):
+        """revise() on cell indices: xi loses the value xj is fixed to."""
+        masks = self.store.masks
+        mask_j = masks[j]
+        if masks[i] & mask_j and mask_j & (mask_j - 1) == 0:
+            self.trail.append((i, masks[i]))
+            masks[i] &= ~mask_j
+            return True
+        return False
+
+    def remove_values(self, cell, bits):
+        """
+        Removes the values in 'bits' from a cell's domain, through the trail.
+
+        Args:
+            cell (int): Index of the cell (row * size + col).
+            bits (int): Mask of the values to remove.
+
+        Returns:
+            int: How many values were actually removed.
+        """
+        masks = self.store.masks
+        removed = masks[cell] & bits
+        if removed:
+            self.trail.append((cell, masks[cell]))
+            masks[cell] &= ~bits
+            if self.stats is not None:
+                self.stats.removals += removed.bit_count()
+        return removed.bit_count()
 
     def get_degree(self, row, col):
         """Calculates the degree of a cell in a Sudoku grid."""
+        board = self.board
+        size = self.size
+        cell = row * size + col
         degree = 0
-        for i in range(9):
-            if self.grid[row][i] == 0 and i != col:  # Check row
-                degree += 1
-            if self.grid[i][col] == 0 and i != row:  # Check column
-                degree += 1
-
-        box_x = col // 3
-        box_y = row // 3
-        for i in range(box_y * 3, box_y * 3 + 3):
-            for j in range(box_x * 3, box_x * 3 + 3):
-                if self.grid[i][j] == 0 and (i, j) != (row, col):  # Check box
+        for unit in (board.rows[row], board.cols[col], board.boxes[board.box_of[cell]]):
+            for peer in unit:
+                if peer != cell and self.grid[peer // size][peer % size] == 0:
                     degree += 1
         return degree
     
@@ -136,114 +300,395 @@ class Sudoku:
     #     self.apply_arc_consistency()
     #     return self.solve_sudoku_recursive()
 
-    def solve_sudoku(self):
-        """Recursive arc consistency backtracking solver with MRV and Degree Heuristic."""
-        self.apply_arc_consistency()
-        if any(len(self.domains[i][j]) == 0 for i in range(9) for j in range(9)):
-            return False  # Base case: Empty domain, no solution possible
-        mrv_cell = self.get_mrv()
-        if not mrv_cell:
-            return True  # Base case: No empty cells, puzzle solved
-        else:
-            row, col = mrv_cell
-
-        for num in list(self.domains[row][col]):  # Iterate through a copy of the domain
-            if self.is_valid(self.grid, num, (row, col)):
-                self.grid[row][col] = num
-                original_domains = copy.deepcopy(self.domains)  # Store the original domains
-                for i in range(9):  # Update the domains of the related cells
-                    if num in self.domains[row][i] and i != col:
-                        self.domains[row][i].discard(num)
-                    if num in self.domains[i][col] and i != row:
-                        self.domains[i][col].discard(num)
-                box_x = col // 3
-                box_y = row // 3
-                for i in range(box_y * 3, box_y * 3 + 3):
-                    for j in range(box_x * 3, box_x * 3 + 3):
-                        if num in self.domains[i][j] and (i, j) != (row, col):
-                            self.domains[i][j].discard(num)
-                self.domains[row][col] = {num}  # Update the domain of the current cell
-                self.grid_history.append(copy.deepcopy(self.grid))
-                self.domains_history.append(copy.deepcopy(self.domains))
-                if self.solve_sudoku():  # Recursive call
-                    return True
-
-                self.grid[row][col] = 0  # Backtrack
-                self.domains = original_domains  # Restore the original domains
+    def solve_sudoku(self, budget=None, strategy="backtrack"):
+        """
+        Arc consistency backtracking solver with MRV and Degree Heuristic.
+
+        Args:
+            budget (SolveBudget, optional): Node/time limit and cancellation.
+                                            When it runs out the solve stops
+                                            and 'status' tells why.
+                                            Defaults to None (no limit).
+            strategy (str, optional): "backtrack", or "dlx" to solve the
+                                      puzzle as an exact-cover problem with
+                                      Dancing Links instead. Both leave the
+                                      same solution in the grid, but "dlx"
+                                      records no intermediate steps and
+                                      ignores rules and hooks.
+                                      Defaults to "backtrack".
+
+        When Sudoku.solution_cache is set, a cached solution of the puzzle
+        (or of a transformed copy of it) is used without searching, and new
+        solutions are added to the cache.
+
+        Returns:
+            bool: True if solved. 'status' distinguishes the other outcomes.
+        """
+        stats = self.stats
+        if stats is not None:
+            start = time.perf_counter()
+            other_time = stats.propagation_time + stats.history_time
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}, expected one of {STRATEGIES}.")
+        self.budget = budget
+        if budget is not None:
+            budget.start()
+        cache = self.solution_cache
+        cached = None
+        mark = len(self.trail)
+        try:
+            if cache is not None:
+                givens = [row[:] for row in self.grid]
+                keys = cache.keys(givens)
+                cached = cache.get(givens, keys)
+            if cached is not None:
+                self.fill([value for row in cached for value in row])
+                solved = True
+            elif strategy == "dlx":
+                solved = self.solve_dlx()
+            else:
+                solved = self.apply_arc_consistency()  # Empty domain, no solution possible
+                mark = len(self.trail)  # Root propagation is sound and kept
+                solved = solved and self.backtrack()
+            if solved and cache is not None and cached is None:
+                cache.put(givens, self.grid, keys)
+            self.status = "solved" if solved else "unsolvable"
+        except BudgetExceeded as exceeded:
+            self.undo(mark)  # Drops the guesses of the interrupted search
+            solved = False
+            self.status = exceeded.status
+        finally:
+            self.budget = None
+        if stats is not None:
+            other_time = stats.propagation_time + stats.history_time - other_time
+            stats.search_time += time.perf_counter() - start - other_time
+        return solved
+
+    def count_solutions(self, limit=2, strategy="backtrack", budget=None):
+        """
+        Counts the solutions of the puzzle, stopping once 'limit' are found.
+
+        Uses the same propagation and MRV search as solve_sudoku, but keeps
+        going after the first solution. Nothing is recorded in the history
+        and the grid and domains are restored before returning.
+
+        Args:
+            limit (int, optional): Stop counting at this many solutions.
+                                   Defaults to 2, enough to tell whether the
+                                   solution is unique.
+            strategy (str, optional): "backtrack" or "dlx", as for
+                                      solve_sudoku. Defaults to "backtrack".
+            budget (SolveBudget, optional): Node/time limit and cancellation.
+                                            Defaults to None (no limit).
+
+        Returns:
+            int: The number of solutions found, at most 'limit'.
+
+        Raises:
+            BudgetExceeded: If the budget ran out before counting finished.
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}, expected one of {STRATEGIES}.")
+        if budget is not None:
+            budget.start()
+        if strategy == "dlx":
+            return shared_solver(self.board.box).solve([value for row in self.grid for value in row], limit, budget)[0]
+        history, self.history = self.history, HistoryRecorder("off")
+        mark = len(self.trail)
+        count = 0
+        self.budget = budget
+        try:
+            if self.apply_arc_consistency():
+                for _ in self.search():
+                    count += 1
+                    if count >= limit:
+                        break
+        finally:
+            self.undo(mark)
+            self.history = history
+            self.budget = None
+        return count
+
+    def solve_dlx(self):
+        """
+        Solves the grid as an exact-cover problem with Dancing Links.
+
+        The solution is written through the trail, like the cells filled by
+        the search, so undo() can take it back.
+
+        Returns:
+            bool: True if the grid was completed, False if no solution exists.
+        """
+        solver = shared_solver(self.board.box)
+        try:
+            _, solution = solver.solve([value for row in self.grid for value in row], 1, self.budget)
+        finally:
+            if self.stats is not None:
+                self.stats.nodes += solver.nodes
+        if solution is None:
+            return False
+        self.fill(solution)
+        return True
+
+    def solve_parallel(self, solver=None, budget=None, strategy="backtrack"):
+        """
+        Solves the puzzle with split-tree search on a process pool.
+
+        The top levels of the search tree are expanded into independent
+        subproblems that the workers of a parallel.SplitSolver search at
+        once; the first solution found stops them all. Worth it for single
+        hard puzzles, where one core would otherwise do all the search.
+        Rules, hooks and the solution cache are not used.
+
+        Args:
+            solver (SplitSolver, optional): Pool to search on. Defaults to
+                                            None, which starts one with a
+                                            worker per CPU for this call.
+            budget (SolveBudget, optional): Time limit and cancellation, as
+                                            for solve_sudoku; a node limit
+                                            applies to each worker.
+            strategy (str, optional): How each subproblem is searched,
+                                      "backtrack" or "dlx".
+                                      Defaults to "backtrack".
+
+        Returns:
+            bool: True if solved. 'status' distinguishes the other outcomes.
+        """
+        if solver is None:
+            from parallel import SplitSolver  # parallel imports this module
+            with SplitSolver() as solver:
+                return self.solve_parallel(solver, budget, strategy)
+        if budget is not None:
+            budget.start()
+        try:
+            _, solution = solver.search(self, 1, strategy, budget)
+        except BudgetExceeded as exceeded:
+            self.status = exceeded.status
+            return False
+        finally:
+            if self.stats is not None:
+                self.stats.nodes += solver.nodes
+        if solution is None:
+            self.status = "unsolvable"
+            return False
+        self.fill(solution)
+        self.status = "solved"
+        return True
+
+    def fill(self, values):
+        """
+        Writes a known solution into the empty cells, through the trail.
+
+        Args:
+            values (list): Every cell's value in row-major order.
+        """
+        masks = self.store.masks
+        for cell, value in enumerate(values):
+            row, col = divmod(cell, self.size)
+            if self.grid[row][col] == 0:
+                self.trail.append((cell, masks[cell]))
+                masks[cell] = bit(value)
+                self.trail.append((cell, None))
+                self.grid[row][col] = value
+        self.record_step()
+
+    def has_unique_solution(self):
+        """True if the puzzle has exactly one solution."""
+        return self.count_solutions(limit=2) == 1
+
+    def backtrack(self):
+        """
+        Searches for the first solution, leaving it in the grid.
+
+        Returns:
+            bool: True if the grid was completed, False if no solution exists.
+        """
+        for _ in self.search():
+            return True
         return False
-    
-    def is_valid(self, grid, num, pos):
-        """Checks if placing 'num' at 'pos' is valid."""
-        # Check row
-        for i in range(len(grid[0])):
-            if grid[pos[0]][i] == num and pos[1] != i:
-                return False
 
-        # Check column
-        for i in range(len(grid)):
-            if grid[i][pos[1]] == num and pos[0] != i:
-                return False
+    def search(self):
+        """
+        Depth-first search with MRV and Degree Heuristic, without recursion.
+
+        Every branch is a frame (cell, values left to try, trail mark) on an
+        explicit stack. Trying the next value, or dropping back to the
+        parent, first undoes the trail to the frame's mark, so the depth of
+        the search is not limited by the Python recursion limit.
+
+        Yields:
+            list: The grid, each time it is completed. Resuming the
+                  generator goes on to look for the next solution.
+        """
+        frames = []
+        descend = True
+        while True:
+            if descend:
+                mrv_cell = self.get_mrv()
+                if mrv_cell:
+                    cell = mrv_cell[0] * self.size + mrv_cell[1]
+                    frames.append((cell, iter(self.store.values(cell)), len(self.trail)))
+                    if self.stats is not None and len(frames) > self.stats.max_depth:
+                        self.stats.max_depth = len(frames)
+                else:
+                    yield self.grid  # No empty cells, puzzle solved
+                    if not frames:
+                        return
+            cell, values, mark = frames[-1]
+            descend = False
+            for num in values:
+                self.undo(mark)
+                if self.is_valid(self.grid, num, divmod(cell, self.size)) and self.assign(cell, num):
+                    descend = True
+                    break
+            if not descend:
+                self.undo(mark)  # Backtrack
+                frames.pop()
+                if self.stats is not None:
+                    self.stats.backtracks += 1
+                if self.hooks is not None and self.hooks.on_backtrack is not None:
+                    self.hooks.on_backtrack(self, divmod(cell, self.size))
+                if not frames:
+                    return
+
+    def assign(self, cell, num):
+        """
+        Places 'num' in a cell and propagates it with AC-3.
 
-        # Check box
-        box_x = pos[1] // 3
-        box_y = pos[0] // 3
+        Args:
+            cell (int): Index of the cell (row * size + col).
+            num (int): The value to place.
 
-        for i in range(box_y * 3, box_y * 3 + 3):
-            for j in range(box_x * 3, box_x * 3 + 3):
-                if grid[i][j] == num and (i, j) != pos:
-                    return False
+        Returns:
+            bool: False if propagation emptied a domain, True otherwise.
+        """
+        if self.stats is not None:
+            self.stats.nodes += 1
+        if self.budget is not None:
+            self.budget.charge()
+        row, col = divmod(cell, self.size)
+        masks = self.store.masks
+        self.trail.append((cell, masks[cell]))
+        masks[cell] = bit(num)  # Update the domain of the current cell
+        self.trail.append((cell, None))
+        self.grid[row][col] = num
+        self.record_step()
+        if self.hooks is not None and self.hooks.on_assign is not None:
+            self.hooks.on_assign(self, (row, col), num)
+        # Only the neighbours of the assigned cell need revising
+        return self.apply_arc_consistency((row, col))
+
+    def undo(self, mark):
+        """
+        Pops the trail back to 'mark', restoring every change made since.
 
+        Entries are (cell, old_mask) for a domain change and (cell, None)
+        for a value written into an empty grid cell.
+        """
+        masks = self.store.masks
+        trail = self.trail
+        index = self.mrv_index
+        while len(trail) > mark:
+            cell, old_mask = trail.pop()
+            if old_mask is None:
+                self.grid[cell // self.size][cell % self.size] = 0
+            else:
+                masks[cell] = old_mask
+            if index is not None and len(trail) < index.synced:  # Only entries the index has seen
+                if old_mask is None:
+                    index.filled(cell, +1)
+                else:
+                    index.refresh(cell)
+        if index is not None and index.synced > mark:
+            index.synced = mark
+
+    def is_valid(self, grid, num, pos):
+        """Checks if placing 'num' at 'pos' is valid."""
+        size = self.size
+        for peer in self.board.peers[pos[0] * size + pos[1]]:
+            if grid[peer // size][peer % size] == num:
+                return False
         return True
 
     def get_mrv(self):
-        """Gets the cell with the Minimum Remaining Values."""
-        min_remaining = 10  # Start with a value greater than any possible domain size
-        mrv_cell = None
-
-        for i in range(9):
-            for j in range(9):
-                if self.grid[i][j] == 0:
-                    remaining_values = len(self.domains[i][j])
-                    if remaining_values < min_remaining:
-                        min_remaining = remaining_values
-                        mrv_cell = (i, j)
-                    elif remaining_values == min_remaining and mrv_cell is not None:
-                        if self.get_degree(i, j) > self.get_degree(mrv_cell[0], mrv_cell[1]):
-                            mrv_cell = (i, j)
-        return mrv_cell
+        """
+        Gets the cell with the Minimum Remaining Values.
+
+        Ties go to the cell with the highest get_degree, then to the first
+        such cell in row-major order. The cell comes from mrv_index, which
+        is updated from the trail instead of rescanning the board.
+
+        Returns:
+            tuple: (row, col) of the cell, or None if the grid is full.
+        """
+        if self.stats is not None:
+            self.stats.mrv_calls += 1
+        if self.mrv_index is None:
+            self.mrv_index = MRVIndex(self.board, self.grid, self.store.masks, self.trail)
+        else:
+            self.mrv_index.sync(self.trail)
+        cell = self.mrv_index.select()
+        return None if cell is None else divmod(cell, self.size)
 
     def update_grid(self):
-        for i in range(9):
-            for j in range(9):
-                if len(self.domains[i][j]) == 1:
-                    self.grid[i][j] = next(iter(self.domains[i][j]))
+        masks = self.store.masks
+        for cell in range(self.board.cells):
+            row, col = divmod(cell, self.size)
+            if self.grid[row][col] == 0 and is_single(masks[cell]):
+                self.trail.append((cell, None))
+                self.grid[row][col] = masks[cell].bit_length()
 
     def print_domains(self):
         # Print the current domains for each cell
         print("Current Domains:")
-        for i in range(9):
-            print([sorted(list(self.domains[i][j])) for j in range(9)])
+        domains = self.domains
+        for i in range(self.size):
+            print([sorted(list(domains[i][j])) for j in range(self.size)])
         print()
 
     def print_grid(self):
         # Print the Sudoku grid
+        width = len(str(self.size))
         for row in self.grid:
-            print(" ".join(str(num) if num != 0 else "_" for num in row))
+            print(" ".join((str(num) if num != 0 else "_").rjust(width) for num in row))
         print()
         
     def generate_puzzle(self, difficilty):
-            if difficilty == "easy":
-                puzzle = str(generators.random_sudoku(avg_rank=50))
-            elif difficilty == "mid": 
-                puzzle = str(generators.random_sudoku(avg_rank=100))
-            elif difficilty == "hard":
-                puzzle = str(generators.random_sudoku(avg_rank=150))
+            """
+            Replaces the grid with a new puzzle of the given difficulty.
+
+            Served from Sudoku.puzzle_pool when one is set and has a puzzle
+            ready; otherwise the puzzle is generated on the spot. The pool
+            only holds 9x9 puzzles.
+            """
+            size = self.size
+            if self.puzzle_pool is not None and self.board.box == 3:
+                puzzle = self.puzzle_pool.take(difficilty)
             else:
-                puzzle = str(generators.random_sudoku(avg_rank=250))
-            self.grid = [list(map(int, puzzle[i:i+9])) for i in range(0, 81, 9)]
+                puzzle = generate(difficilty, self.board.box)
+            self.grid = [list(map(int, puzzle[i:i+size])) for i in range(0, size * size, size)]
             self.initialize_domains()
 
 
+@lru_cache(maxsize=256)
+def reference_solution(givens):
+    """
+    Solves a puzzle once per distinct set of givens and caches the result.
+
+    Args:
+        givens (tuple): The cell values in row-major order, 0 for empty; 81
+                        of them for a 9x9 board.
+
+    Returns:
+        tuple: The values of the solution, or None if there is none.
+    """
+    size = isqrt(len(givens))
+    sudoku = Sudoku([list(givens[i:i + size]) for i in range(0, size * size, size)])
+    if sudoku.solve_sudoku():
+        return tuple(value for row in sudoku.grid for value in row)
+    return None
+
+
 if __name__ == "__main__":
     grid3 = [[0, 5, 0, 1, 0, 9, 0, 0, 0],
             [0, 9, 0, 2, 0, 0, 0, 0, 7],
@@ -254,7 +699,7 @@ if __name__ == "__main__":
             [0, 8, 2, 0, 4, 1, 0, 0, 0],
             [0, 0, 5, 7, 3, 0, 0, 0, 1],
             [0, 3, 0, 0, 0, 0, 0, 0, 0]]
-    sudoku = Sudoku()
+    sudoku = Sudoku(history="full")
     sudoku.generate_puzzle("mid")
     # print("Puzzle:", sudoku.grid)
     print("Solving:")
@@ -0,0 +1,112 @@
+"""
+Incremental index for picking the MRV cell.
+
+Sudoku.get_mrv used to scan every cell at every search node and compute
+degrees for the ties. MRVIndex instead keeps the empty cells in buckets
+by domain size and degree, and keeps each cell's degree up to date as
+cells are filled and emptied, so choosing a cell only looks at the first
+non-empty bucket.
+
+The index follows the Sudoku's trail rather than being called on every
+change: sync() applies the trail entries added since the last call, and
+Sudoku.undo() reports the entries it pops that the index had already
+applied. Every change to the grid and domains goes through the trail, so
+the two stay in step.
+"""
+
+
+class MRVIndex:
+    """
+    Empty cells bucketed by (domain size, degree).
+
+    The degree of a cell is the number of empty cells in its row, column
+    and box other than itself, counted once per unit, which is what
+    Sudoku.get_degree computes.
+
+    Attributes:
+        synced (int): Length of the trail the index reflects.
+    """
+    def __init__(self, board, grid, masks, trail):
+        """
+        Builds the index from the current grid and domains.
+
+        Args:
+            board (Board): Geometry of the grid.
+            grid (list): The grid; read, never written.
+            masks (array): The domain masks; read, never written.
+            trail (list): The undo trail of the same Sudoku.
+        """
+        self.grid = grid
+        self.masks = masks
+        self.size = size = board.size
+        self._units_of = tuple(
+            (board.rows[board.row_of[cell]], board.cols[board.col_of[cell]], board.boxes[board.box_of[cell]])
+            for cell in range(board.cells)
+        )
+        self._buckets = [[set() for _ in range(3 * (size - 1) + 1)] for _ in range(size + 1)]
+        self._counts = [0] * (size + 1)  # Indexed cells per domain size
+        self._size_of = [-1] * board.cells  # Bucket row of each indexed cell, -1 if filled
+        empty = [value == 0 for row in grid for value in row]
+        open_in = {unit: sum(empty[cell] for cell in unit) for unit in board.units}
+        self._degree = [
+            sum(open_in[unit] for unit in self._units_of[cell]) - 3 * empty[cell]
+            for cell in range(board.cells)
+        ]
+        for cell in range(board.cells):
+            self.refresh(cell)
+        self.synced = len(trail)
+
+    def refresh(self, cell):
+        """Moves a cell to the bucket of its current domain size, or out if filled."""
+        count = self._size_of[cell]
+        if count >= 0:
+            self._buckets[count][self._degree[cell]].discard(cell)
+            self._counts[count] -= 1
+        if self.grid[cell // self.size][cell % self.size] == 0:
+            count = self.masks[cell].bit_count()
+            self._buckets[count][self._degree[cell]].add(cell)
+            self._counts[count] += 1
+            self._size_of[cell] = count
+        else:
+            self._size_of[cell] = -1
+
+    def filled(self, cell, delta=-1):
+        """Updates the index after a cell was filled (delta -1) or emptied (+1)."""
+        degree = self._degree
+        size_of = self._size_of
+        buckets = self._buckets
+        for unit in self._units_of[cell]:
+            for peer in unit:
+                if peer != cell:
+                    count = size_of[peer]
+                    if count >= 0:
+                        row = buckets[count]
+                        row[degree[peer]].discard(peer)
+                        row[degree[peer] + delta].add(peer)
+                    degree[peer] += delta
+        self.refresh(cell)
+
+    def sync(self, trail):
+        """Applies the trail entries added since the last sync."""
+        for position in range(self.synced, len(trail)):
+            cell, old_mask = trail[position]
+            if old_mask is None:
+                self.filled(cell)
+            else:
+                self.refresh(cell)
+        self.synced = len(trail)
+
+    def select(self):
+        """
+        The cell to branch on: fewest values, then highest degree, then
+        lowest index.
+
+        Returns:
+            int: The cell index, or None if no cell is empty.
+        """
+        for count, cells in enumerate(self._counts):
+            if cells:
+                for bucket in reversed(self._buckets[count]):
+                    if bucket:
+                        return min(bucket)
+        return None
@@ -0,0 +1,276 @@
+"""
+Split-tree parallel search for single hard puzzles.
+
+Sudoku.solve_sudoku searches one tree on one core. SplitSolver expands
+the top levels of that tree in the calling process instead: it propagates
+the puzzle, branches on the MRV cell, propagates each branch, and repeats
+level by level until there are enough open branches to keep every worker
+busy. Each branch becomes an independent subproblem carrying its own copy
+of the grid and domain masks, and the subproblems are searched on a
+process pool.
+
+All workers share one multiprocessing.Event through their SolveBudget.
+Once a solution is found, or the solution-count limit is reached, the
+event is set and every running search stops at its next node; subproblems
+not yet started are dropped.
+
+When a puzzle has several solutions, the one returned is whichever a
+worker finds first, not necessarily the one the serial search would find.
+
+Usage:
+    python parallel.py benchmarks/known_hard.txt [--workers 8] [--tasks 32] [--strategy dlx]
+
+prints the serial and split-tree solve time of every puzzle in the file.
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from math import isqrt
+from batch import parse_puzzle, read_puzzles
+from budget import BudgetExceeded, SolveBudget
+from dlx import shared_solver
+from main import STRATEGIES, Sudoku
+
+_stop = None  # The worker's copy of SplitSolver's stop event
+
+
+def _init_worker(stop):
+    global _stop
+    _stop = stop
+
+
+def _load(sudoku, state):
+    """Puts a subproblem's grid and domain masks into 'sudoku'."""
+    values, masks = state
+    size = sudoku.size
+    sudoku.grid = [list(values[r * size:(r + 1) * size]) for r in range(size)]
+    sudoku.store.masks = array(sudoku.board.typecode, masks)
+    sudoku.trail = []
+    sudoku.mrv_index = None
+
+
+def _state(sudoku):
+    """A copy of the grid and domain masks, small enough to send to a worker."""
+    return tuple(value for row in sudoku.grid for value in row), sudoku.store.masks.tobytes()
+
+
+def search_subproblem(state, limit=1, strategy="backtrack", max_nodes=None, time_limit=None):
+    """
+    Searches one subproblem; runs inside the worker processes.
+
+    Args:
+        state (tuple): (cell values, domain mask bytes) from the split.
+        limit (int, optional): Stop after this many solutions. Defaults to 1.
+        strategy (str, optional): "backtrack" or "dlx". Defaults to
+                                  "backtrack".
+        max_nodes (int, optional): Node limit. Defaults to None.
+        time_limit (float, optional): Seconds left. Defaults to None.
+
+    Returns:
+        tuple: (count, solution, status, nodes). 'solution' is the first
+               solution as a tuple of cell values or None; 'status' is
+               "done", "budget_exceeded" or "cancelled".
+    """
+    values, masks = state
+    box = isqrt(isqrt(len(values)))
+    budget = SolveBudget(max_nodes, time_limit, _stop)
+    budget.start()
+    count = 0
+    solution = None
+    status = "done"
+    try:
+        if strategy == "dlx":
+            count, found = shared_solver(box).solve(list(values), limit, budget)
+            solution = tuple(found) if found is not None else None
+        else:
+            sudoku = Sudoku(box=box)
+            _load(sudoku, state)
+            sudoku.budget = budget
+            for grid in sudoku.search():
+                if solution is None:
+                    solution = tuple(value for row in grid for value in row)
+                count += 1
+                if count >= limit:
+                    break
+    except BudgetExceeded as exceeded:
+        status = exceeded.status
+    return count, solution, status, budget.nodes
+
+
+class SplitSolver:
+    """
+    A process pool that searches the subproblems of one puzzle at a time.
+
+    Keep one around to avoid starting processes for every puzzle; use as a
+    context manager, or call close() when done.
+
+    Attributes:
+        workers (int): Worker processes.
+        tasks (int): Open branches to split a puzzle into before handing
+                     them to the pool. More than 'workers', so that a
+                     worker that finishes an easy branch early picks up
+                     another one.
+        nodes (int): Search nodes the workers used in the last search.
+    """
+    def __init__(self, workers=None, tasks=None):
+        """
+        Starts the pool.
+
+        Args:
+            workers (int, optional): Worker processes. Defaults to the
+                                     number of CPUs.
+            tasks (int, optional): Subproblems to aim for. Defaults to four
+                                   per worker.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.tasks = tasks or 4 * self.workers
+        self.nodes = 0
+        self._stop = multiprocessing.Event()
+        self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self._stop,))
+
+    def close(self):
+        self._pool.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def split(self, sudoku, limit=1):
+        """
+        Expands the top of the search tree, breadth first.
+
+        Every level branches each open subproblem on its MRV cell and
+        propagates each value with assign(); branches that fail are
+        dropped and branches that complete the grid are solutions.
+
+        Args:
+            sudoku (Sudoku): Scratch copy of the puzzle, arc consistent.
+                             Left in an unspecified state.
+            limit (int, optional): Stop once this many solutions are found.
+
+        Returns:
+            tuple: (subproblems, solutions), both lists of states.
+        """
+        frontier = [_state(sudoku)]
+        solutions = []
+        while frontier and len(frontier) < self.tasks and len(solutions) < limit:
+            children = []
+            for state in frontier:
+                _load(sudoku, state)
+                mrv = sudoku.get_mrv()
+                if mrv is None:
+                    solutions.append(state)
+                    continue
+                cell = mrv[0] * sudoku.size + mrv[1]
+                for num in sudoku.store.values(cell):
+                    if sudoku.is_valid(sudoku.grid, num, mrv) and sudoku.assign(cell, num):
+                        children.append(_state(sudoku))
+                    sudoku.undo(0)
+            frontier = children
+        return frontier, solutions
+
+    def search(self, sudoku, limit=1, strategy="backtrack", budget=None):
+        """
+        Searches a puzzle on the pool.
+
+        Propagation rules, hooks and history of 'sudoku' are not used.
+
+        Args:
+            sudoku (Sudoku): The puzzle; its grid and domains are not
+                             changed.
+            limit (int, optional): Stop after this many solutions.
+                                   Defaults to 1.
+            strategy (str, optional): How the workers search each
+                                      subproblem, "backtrack" or "dlx".
+                                      Defaults to "backtrack".
+            budget (SolveBudget, optional): Limits for the whole search,
+                                            already started. The node
+                                            limit applies to each worker.
+
+        Returns:
+            tuple: (count, solution). 'count' is at most 'limit';
+                   'solution' is the first solution found as a list of cell
+                   values in row-major order, or None.
+
+        Raises:
+            BudgetExceeded: If the budget ran out or was cancelled first.
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}, expected one of {STRATEGIES}.")
+        self.nodes = 0
+        scratch = Sudoku(box=sudoku.board.box)
+        _load(scratch, _state(sudoku))
+        scratch.budget = budget
+        if not scratch.apply_arc_consistency():
+            return 0, None
+        subproblems, solutions = self.split(scratch, limit)
+        count = len(solutions)
+        solution = list(solutions[0][0]) if solutions else None
+        if count >= limit or not subproblems:
+            return min(count, limit), solution
+
+        deadline = time_limit = max_nodes = None
+        if budget is not None:
+            if budget.max_nodes is not None:
+                max_nodes = max(0, budget.max_nodes - budget.nodes)
+            time_limit = budget.remaining()
+            if time_limit is not None:
+                deadline = time.perf_counter() + time_limit
+        pending = {self._pool.submit(search_subproblem, state, limit - count, strategy, max_nodes, time_limit)
+                   for state in subproblems}
+        exceeded = None
+        try:
+            while pending and count < limit and exceeded is None:
+                done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+                for future in done:
+                    found, first, status, nodes = future.result()
+                    self.nodes += nodes
+                    count += found
+                    if solution is None and first is not None:
+                        solution = list(first)
+                    if status != "done" and exceeded is None:
+                        exceeded = status
+                if budget is not None and budget.cancelled:
+                    exceeded = "cancelled"
+                elif deadline is not None and time.perf_counter() > deadline:
+                    exceeded = "budget_exceeded"
+        finally:
+            self._stop.set()  # Stops the searches still running
+            for future in pending:
+                future.cancel()
+            wait(pending)
+            self._stop.clear()
+        if count >= limit:
+            return limit, solution
+        if exceeded is not None:
+            raise BudgetExceeded(exceeded)
+        return count, solution
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare serial and split-tree solve times.")
+    parser.add_argument("input", help="puzzle file, one per line, or a packed corpus")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--tasks", type=int, default=None, help="subproblems per puzzle (default: 4 per worker)")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="backtrack", help="search used by both")
+    args = parser.parse_args(argv)
+
+    with SplitSolver(args.workers, args.tasks) as solver:
+        for puzzle in read_puzzles(args.input):
+            start = time.perf_counter()
+            Sudoku(parse_puzzle(puzzle)).solve_sudoku(strategy=args.strategy)
+            serial = time.perf_counter() - start
+            sudoku = Sudoku(parse_puzzle(puzzle))
+            start = time.perf_counter()
+            sudoku.solve_parallel(solver, strategy=args.strategy)
+            split = time.perf_counter() - start
+            print(f"{puzzle}  {sudoku.status:<10}  serial {serial * 1000:9.1f} ms  split {split * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Pre-generated puzzles for Sudoku.generate_puzzle.
+
+Generating a puzzle with dokusan gets slow at higher ranks, so a
+PuzzlePool keeps a queue of ready puzzles per difficulty. A background
+thread refills a queue up to the high watermark whenever it drops below
+the low watermark. The queues are saved to a JSON file and loaded again
+on start, so the pool is warm after a restart.
+"""
+import json
+import os
+import random
+import threading
+from collections import deque
+from dokusan import generators
+
+DIFFICULTY_RANKS = {"easy": 50, "mid": 100, "hard": 150, "expert": 250}
+
+# Share of empty cells for boards other than 9x9, which dokusan cannot make.
+# Kept below one half: past that, random blanks on a 25x25 board quickly
+# give puzzles that take minutes to search.
+BLANK_SHARES = {"easy": 0.30, "mid": 0.35, "hard": 0.40, "expert": 0.45}
+
+
+def difficulty_key(difficulty):
+    """Maps any difficulty name to a pool key; unknown names mean "expert"."""
+    return difficulty if difficulty in DIFFICULTY_RANKS else "expert"
+
+
+def generate(difficulty, box=3):
+    """
+    Generates one puzzle.
+
+    Args:
+        difficulty (str): "easy", "mid", "hard" or "expert".
+        box (int, optional): Box size of the board. Defaults to 3.
+
+    Returns:
+        str or list: For 9x9, an 81-character string with 0 for empty cells.
+                     For other sizes, a flat list of ints from shuffling a
+                     patterned solution and emptying a share of its cells;
+                     such puzzles always have a solution but it may not be
+                     unique.
+    """
+    if box == 3:
+        return str(generators.random_sudoku(avg_rank=DIFFICULTY_RANKS[difficulty_key(difficulty)]))
+    size = box * box
+    bands = random.sample(range(box), box)
+    rows = [band * box + r for band in bands for r in random.sample(range(box), box)]
+    stacks = random.sample(range(box), box)
+    cols = [stack * box + c for stack in stacks for c in random.sample(range(box), box)]
+    values = random.sample(range(1, size + 1), size)
+    puzzle = [values[(box * (r % box) + r // box + c) % size] for r in rows for c in cols]
+    for cell in random.sample(range(size * size), round(size * size * BLANK_SHARES[difficulty_key(difficulty)])):
+        puzzle[cell] = 0
+    return puzzle
+
+
+class PuzzlePool:
+    """
+    Queues of ready puzzles per difficulty, refilled by a background thread.
+
+    Attributes:
+        path (str): JSON file the queues are saved to, or None.
+        low (int): A queue below this size is refilled.
+        high (int): Size a queue is refilled up to.
+    """
+    def __init__(self, path=None, low=5, high=20, generator=generate):
+        """
+        Creates the pool and loads any puzzles saved at 'path'.
+
+        Args:
+            path (str, optional): File to persist the pool to. Defaults to
+                                  None (not persisted).
+            low (int, optional): Low watermark. Defaults to 5.
+            high (int, optional): High watermark. Defaults to 20.
+            generator (callable, optional): generator(difficulty) returning
+                                            an 81-character puzzle.
+        """
+        if not 0 <= low <= high:
+            raise ValueError("Watermarks must satisfy 0 <= low <= high.")
+        self.path = path
+        self.low = low
+        self.high = high
+        self.generator = generator
+        self._queues = {difficulty: deque() for difficulty in DIFFICULTY_RANKS}
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self.load()
+
+    def __len__(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def size(self, difficulty):
+        """Number of ready puzzles for a difficulty."""
+        return len(self._queues[difficulty_key(difficulty)])
+
+    def get(self, difficulty):
+        """
+        Takes a ready puzzle, or returns None if there is none.
+
+        Wakes the background thread when the queue drops below the low
+        watermark.
+        """
+        queue = self._queues[difficulty_key(difficulty)]
+        with self._wakeup:
+            puzzle = queue.popleft() if queue else None
+            if len(queue) < self.low:
+                self._wakeup.notify()
+        return puzzle
+
+    def take(self, difficulty):
+        """Takes a ready puzzle, generating one on the spot if none is left."""
+        puzzle = self.get(difficulty)
+        return puzzle if puzzle is not None else self.generator(difficulty)
+
+    def fill(self):
+        """Tops up, in this thread, every queue that is below the low watermark."""
+        for difficulty, queue in self._queues.items():
+            if len(queue) >= self.low:
+                continue
+            while len(queue) < self.high and not self._stopping:
+                puzzle = self.generator(difficulty)  # Slow, so done outside the lock
+                with self._wakeup:
+                    queue.append(puzzle)
+            self.save()
+
+    def start(self):
+        """Starts the background refill thread. Returns the pool."""
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._refill_loop, name="puzzle-pool", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the background thread and saves the pool."""
+        if self._thread is not None:
+            with self._wakeup:
+                self._stopping = True
+                self._wakeup.notify()
+            self._thread.join()
+            self._thread = None
+        self.save()
+
+    def load(self):
+        """Loads the puzzles saved at 'path', if the file exists."""
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return  # A damaged pool file only costs a refill
+        with self._wakeup:
+            for difficulty, puzzles in saved.items():
+                if difficulty in self._queues:
+                    self._queues[difficulty].extend(puzzles)
+
+    def save(self):
+        """Writes the queues to 'path', replacing the file atomically."""
+        if self.path is None:
+            return
+        with self._wakeup:
+            data = {difficulty: list(queue) for difficulty, queue in self._queues.items()}
+        temp = self.path + ".tmp"
+        with open(temp, "w") as f:
+            json.dump(data, f)
+        os.replace(temp, self.path)
+
+    def _refill_loop(self):
+        while True:
+            self.fill()
+            with self._wakeup:
+                while not self._stopping and all(len(q) >= self.low for q in self._queues.values()):
+                    self._wakeup.wait()
+                if self._stopping:
+                    return
@@ -0,0 +1,240 @@
+"""
+Propagation rules that run after arc consistency.
+
+Arc consistency only removes values that a decided neighbour already
+holds. The rules here look at whole units instead:
+
+- hidden_singles: a value with one possible cell in a unit goes there.
+- naked_pairs / naked_triples: k cells of a unit whose candidates
+  together are k values; those values leave the rest of the unit.
+- hidden_pairs / hidden_triples: k values of a unit that fit in only k
+  cells; those cells lose every other value.
+- pointing: a value confined to one row or column inside a box leaves
+  the rest of that row or column, and a value confined to one box inside
+  a row or column leaves the rest of that box (box-line reduction).
+
+Each rule can be switched on by name with Sudoku(rules=[...]) and keeps
+its own counters, so its effect on search nodes can be measured.
+"""
+from itertools import combinations
+from board import mask_values
+
+
+class Rule:
+    """
+    Base class of a propagation rule.
+
+    Attributes:
+        name (str): Name used to enable the rule.
+        calls (int): Times the rule was run.
+        applications (int): Deductions that removed at least one value.
+        removals (int): Values removed from domains.
+    """
+    name = None
+
+    def __init__(self):
+        self.calls = 0
+        self.applications = 0
+        self.removals = 0
+
+    def apply(self, sudoku, changed):
+        """
+        Runs the rule once over the board.
+
+        Args:
+            sudoku (Sudoku): The puzzle; removals go through
+                             sudoku.remove_values so they can be undone.
+            changed (set): Receives the index of every cell it changes.
+
+        Returns:
+            bool: False if the rule found a contradiction.
+        """
+        raise NotImplementedError
+
+    def remove(self, sudoku, cell, bits, changed):
+        """Removes 'bits' from a cell and updates the counters."""
+        removed = sudoku.remove_values(cell, bits)
+        if removed:
+            self.removals += removed
+            changed.add(cell)
+        return removed
+
+    def counters(self):
+        return {"calls": self.calls, "applications": self.applications, "removals": self.removals}
+
+
+class HiddenSingles(Rule):
+    name = "hidden_singles"
+
+    def apply(self, sudoku, changed):
+        self.calls += 1
+        masks = sudoku.store.masks
+        all_values = sudoku.board.all_values
+        for unit in sudoku.board.units:
+            once = more = 0
+            for cell in unit:
+                more |= once & masks[cell]
+                once |= masks[cell]
+            if once != all_values:
+                return False  # Some value has no place left in this unit
+            for value in mask_values(once & ~more):
+                value_bit = 1 << (value - 1)
+                for cell in unit:
+                    if masks[cell] & value_bit:
+                        if self.remove(sudoku, cell, masks[cell] & ~value_bit, changed):
+                            self.applications += 1
+                        break
+        return True
+
+
+class NakedSubsets(Rule):
+    """k cells of a unit holding only k values between them."""
+    def __init__(self, size):
+        super().__init__()
+        self.size = size
+        self.name = {2: "naked_pairs", 3: "naked_triples"}.get(size, f"naked_{size}")
+
+    def apply(self, sudoku, changed):
+        self.calls += 1
+        masks = sudoku.store.masks
+        for unit in sudoku.board.units:
+            open_cells = [cell for cell in unit if 2 <= masks[cell].bit_count() <= self.size]
+            for subset in combinations(open_cells, self.size):
+                union = 0
+                for cell in subset:
+                    union |= masks[cell]
+                if union.bit_count() != self.size:
+                    continue
+                removed = False
+                for cell in unit:
+                    if cell not in subset and masks[cell] & union:
+                        removed |= bool(self.remove(sudoku, cell, union, changed))
+                        if not masks[cell]:
+                            return False
+                self.applications += removed
+        return True
+
+
+class HiddenSubsets(Rule):
+    """k values of a unit that fit in only k cells."""
+    def __init__(self, size):
+        super().__init__()
+        self.size = size
+        self.name = {2: "hidden_pairs", 3: "hidden_triples"}.get(size, f"hidden_{size}")
+
+    def apply(self, sudoku, changed):
+        self.calls += 1
+        masks = sudoku.store.masks
+        for unit in sudoku.board.units:
+            places = {}  # value -> cells of the unit it can still go in
+            for value in range(1, len(unit) + 1):
+                value_bit = 1 << (value - 1)
+                cells = [cell for cell in unit if masks[cell] & value_bit]
+                if 2 <= len(cells) <= self.size:
+                    places[value] = cells
+            for values in combinations(places, self.size):
+                cells = set()
+                for value in values:
+                    cells.update(places[value])
+                if len(cells) != self.size:
+                    continue
+                keep = 0
+                for value in values:
+                    keep |= 1 << (value - 1)
+                removed = False
+                for cell in cells:
+                    removed |= bool(self.remove(sudoku, cell, masks[cell] & ~keep, changed))
+                self.applications += removed
+        return True
+
+
+class PointingBoxLine(Rule):
+    """Pointing pairs/triples and box-line reduction."""
+    name = "pointing"
+
+    def apply(self, sudoku, changed):
+        self.calls += 1
+        masks = sudoku.store.masks
+        board = sudoku.board
+        row_of, col_of, box_of = board.row_of, board.col_of, board.box_of
+        for box in board.boxes:
+            for value_bit in (1 << v for v in range(len(box))):
+                cells = [cell for cell in box if masks[cell] & value_bit]
+                if len(cells) < 2:
+                    continue
+                for line_of, lines in ((row_of, board.rows), (col_of, board.cols)):
+                    line = line_of[cells[0]]
+                    if all(line_of[cell] == line for cell in cells):
+                        self._clear(sudoku, lines[line], box_of[cells[0]], box_of, value_bit, changed)
+        for line_of, lines in ((row_of, board.rows), (col_of, board.cols)):
+            for line in lines:
+                for value_bit in (1 << v for v in range(len(line))):
+                    cells = [cell for cell in line if masks[cell] & value_bit]
+                    if len(cells) < 2:
+                        continue
+                    box = box_of[cells[0]]
+                    if all(box_of[cell] == box for cell in cells):
+                        self._clear(sudoku, board.boxes[box], line_of[cells[0]], line_of, value_bit, changed)
+        return True
+
+    def _clear(self, sudoku, unit, keep, keep_of, value_bit, changed):
+        """Removes a value from the cells of 'unit' outside the kept row, column or box."""
+        masks = sudoku.store.masks
+        removed = False
+        for cell in unit:
+            if keep_of[cell] != keep and masks[cell] & value_bit:
+                removed |= bool(self.remove(sudoku, cell, value_bit, changed))
+        self.applications += removed
+
+
+RULES = {
+    "hidden_singles": HiddenSingles,
+    "naked_pairs": lambda: NakedSubsets(2),
+    "naked_triples": lambda: NakedSubsets(3),
+    "hidden_pairs": lambda: HiddenSubsets(2),
+    "hidden_triples": lambda: HiddenSubsets(3),
+    "pointing": PointingBoxLine,
+}
+
+
+class PropagationPipeline:
+    """
+    An ordered list of rules, run after each arc consistency pass.
+
+    Rules are tried cheapest first. As soon as one of them changes the
+    board, run() returns so arc consistency can follow up on the change
+    before the more expensive rules are tried.
+    """
+    def __init__(self, rules):
+        """
+        Args:
+            rules (list): Rule instances, or names from RULES.
+        """
+        self.rules = []
+        for rule in rules:
+            if isinstance(rule, str):
+                if rule not in RULES:
+                    raise ValueError(f"Unknown propagation rule {rule!r}, expected one of {sorted(RULES)}.")
+                rule = RULES[rule]()
+            self.rules.append(rule)
+
+    def run(self, sudoku):
+        """
+        Runs the rules until one of them changes something.
+
+        Returns:
+            set: Indices of the changed cells (empty if no rule applied), or
+                 None if a rule found a contradiction.
+        """
+        masks = sudoku.store.masks
+        for rule in self.rules:
+            changed = set()
+            if not rule.apply(sudoku, changed) or not all(masks[cell] for cell in changed):
+                return None
+            if changed:
+                return changed
+        return set()
+
+    def counters(self):
+        """Counters of every rule, keyed by rule name."""
+        return {rule.name: rule.counters() for rule in self.rules}
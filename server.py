@@ -0,0 +1,415 @@
+"""
+Local solve service speaking JSON lines.
+
+Each request is one JSON object per line and gets one JSON object back
+with the same "id". Responses may come back in a different order than
+the requests did.
+
+    {"id": 1, "op": "solve", "puzzle": "53..7....6..195...", "strategy": "dlx", "deadline": 2.0}
+    {"id": 1, "ok": true, "result": {"status": "solved", "solution": "534678912...", "seconds": 0.003}}
+
+Operations:
+    solve     puzzle, strategy ("backtrack" or "dlx"); returns status and solution
+    count     puzzle, limit (default 2), strategy; returns the solution count
+    generate  difficulty ("easy", "mid", "hard", "expert"); returns a puzzle
+    validate  puzzle; returns whether it breaks no rule, is complete, and
+              how many solutions it has (0, 1 or 2 meaning "several")
+    metrics   queue depth, in-flight work, counts and latency percentiles
+
+"puzzle" is an 81-character line ('0' or '.' for empty cells) or a 9x9
+list of lists. "deadline" is optional, in seconds from arrival; a request
+still unanswered by then gets {"ok": false, "error": "deadline_exceeded"}.
+
+Work runs on a warm process pool. Each request is submitted to the pool
+on its own and answered as soon as it finishes, so a slow request never
+holds up the others. At most two requests per worker are in the pool at
+once; the rest wait in a bounded queue, and when that is full the server
+stops reading until there is room again. Workers are given the deadline too, and solve,
+count and validate stop searching once it passes.
+
+Usage:
+    python server.py --stdio
+    python server.py --unix /tmp/sudoku.sock
+    python server.py --tcp 127.0.0.1:8765 [--workers 4] [--max-queue 1024]
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from batch import format_grid, parse_puzzle
+from bench import percentile
+from budget import BudgetExceeded, SolveBudget
+from main import STRATEGIES, Sudoku
+from pool import DIFFICULTY_RANKS, generate
+
+OPERATIONS = ("solve", "count", "generate", "validate")
+
+
+def warm_worker():
+    """Pool initializer: pays the imports and table builds before the first request."""
+    Sudoku([[0] * 9 for _ in range(9)]).solve_sudoku(strategy="dlx")
+
+
+def _grid(puzzle):
+    if isinstance(puzzle, str):
+        return parse_puzzle(puzzle)
+    if (isinstance(puzzle, list) and len(puzzle) == 9
+            and all(isinstance(row, list) and len(row) == 9 for row in puzzle)
+            and all(isinstance(value, int) and 0 <= value <= 9 for row in puzzle for value in row)):
+        return [row[:] for row in puzzle]
+    raise ValueError("'puzzle' must be an 81-character line or a 9x9 list of digits.")
+
+
+def _strategy(request):
+    strategy = request.get("strategy", "backtrack")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy!r}, expected one of {STRATEGIES}.")
+    return strategy
+
+
+def _breaks_rules(sudoku):
+    """True if two filled cells of a unit hold the same value."""
+    values = [value for row in sudoku.grid for value in row]
+    for unit in sudoku.board.units:
+        seen = [values[cell] for cell in unit if values[cell]]
+        if len(seen) != len(set(seen)):
+            return True
+    return False
+
+
+def handle_request(request, time_limit=None):
+    """
+    Runs one request; called inside the worker processes.
+
+    Args:
+        request (dict): The decoded request.
+        time_limit (float, optional): Seconds left before its deadline.
+
+    Returns:
+        dict: The "result" part of the response.
+
+    Raises:
+        ValueError: If the request is malformed.
+        BudgetExceeded: If count or validate ran out of time.
+    """
+    op = request.get("op")
+    if op == "solve":
+        sudoku = Sudoku(_grid(request.get("puzzle")))
+        start = time.perf_counter()
+        solved = sudoku.solve_sudoku(SolveBudget(time_limit=time_limit), strategy=_strategy(request))
+        return {
+            "status": sudoku.status,
+            "solution": format_grid(sudoku.grid) if solved else None,
+            "seconds": time.perf_counter() - start,
+        }
+    if op == "count":
+        limit = request.get("limit", 2)
+        if not isinstance(limit, int) or limit < 1:
+            raise ValueError("'limit' must be a positive integer.")
+        sudoku = Sudoku(_grid(request.get("puzzle")))
+        return {"count": sudoku.count_solutions(limit, _strategy(request), SolveBudget(time_limit=time_limit))}
+    if op == "generate":
+        difficulty = request.get("difficulty", "easy")
+        if difficulty not in DIFFICULTY_RANKS:
+            raise ValueError(f"Unknown difficulty {difficulty!r}, expected one of {sorted(DIFFICULTY_RANKS)}.")
+        return {"puzzle": format_grid(_grid(generate(difficulty)))}
+    if op == "validate":
+        sudoku = Sudoku(_grid(request.get("puzzle")))
+        valid = not _breaks_rules(sudoku)
+        return {
+            "valid": valid,
+            "complete": valid and all(value for row in sudoku.grid for value in row),
+            "solutions": sudoku.count_solutions(2, "dlx", SolveBudget(time_limit=time_limit)) if valid else 0,
+        }
+    raise ValueError(f"Unknown op {op!r}, expected one of {OPERATIONS + ('metrics',)}.")
+
+
+def run_job(request, deadline=None):
+    """
+    Runs one request in a worker process.
+
+    Args:
+        request (dict): The decoded request.
+        deadline (float, optional): time.time() by which to answer. The
+                                    time left is measured when the worker
+                                    starts on it, not when it was queued.
+
+    Returns:
+        tuple: (ok, result or error message).
+    """
+    time_limit = None
+    if deadline is not None:
+        time_limit = deadline - time.time()
+        if time_limit <= 0:
+            return False, "deadline_exceeded"
+    try:
+        return True, handle_request(request, time_limit)
+    except BudgetExceeded:
+        return False, "deadline_exceeded"
+    except ValueError as error:
+        return False, str(error)
+
+
+class _Job:
+    __slots__ = ("request", "future", "deadline")
+
+    def __init__(self, request, future, deadline):
+        self.request = request
+        self.future = future
+        self.deadline = deadline  # loop.time() by which to answer, or None
+
+
+class SolveServer:
+    """
+    The asyncio front end: reads requests, dispatches them to the pool and
+    writes the responses.
+
+    Attributes:
+        workers (int): Worker processes.
+        max_queue (int): Requests waiting for a worker before reading stops.
+    """
+    def __init__(self, workers=None, max_queue=1024, latency_window=1000):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self._pool = None
+        self._queue = None
+        self._slots = None  # Bounds the requests submitted to the pool at once
+        self._dispatcher = None
+        self._started = time.monotonic()
+        self._latencies = deque(maxlen=latency_window)
+        self._counts = {"received": 0, "answered": 0, "errors": 0, "deadline_exceeded": 0}
+        self._ops = {}
+        self._running = 0
+
+    async def start(self):
+        """Starts the worker pool, warms every worker and starts dispatching."""
+        loop = asyncio.get_running_loop()
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_worker)
+        await asyncio.gather(*(loop.run_in_executor(self._pool, os.getpid) for _ in range(self.workers)))
+        self._queue = asyncio.Queue(self.max_queue)
+        self._slots = asyncio.Semaphore(2 * self.workers)
+        self._dispatcher = asyncio.create_task(self._dispatch_loop())
+
+    async def stop(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    def metrics(self):
+        """Queue depth, work in flight, counters and latency percentiles."""
+        latencies = list(self._latencies)
+        report = {
+            "uptime_seconds": time.monotonic() - self._started,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "requests_running": self._running,
+            "workers": self.workers,
+            "ops": dict(self._ops),
+        }
+        report.update(self._counts)
+        for p in (50, 95, 99):
+            report[f"p{p}_ms"] = percentile(latencies, p) * 1000 if latencies else None
+        return report
+
+    async def handle_connection(self, lines, write):
+        """
+        Serves one client until its input ends.
+
+        A request waiting for a worker is queued before the next line is
+        read, so a full queue stops reading from the client.
+
+        Args:
+            lines: Async iterator over the request lines (bytes).
+            write: Coroutine function sending one response line (bytes).
+        """
+        loop = asyncio.get_running_loop()
+        lock = asyncio.Lock()
+        pending = set()
+
+        async def respond(arrived, response):
+            self._counts["answered"] += 1
+            if not response["ok"]:
+                self._counts["errors"] += 1
+            self._latencies.append(loop.time() - arrived)
+            async with lock:
+                await write((json.dumps(response) + "\n").encode())
+
+        async for line in lines:
+            if not line.strip():
+                continue
+            arrived = loop.time()
+            self._counts["received"] += 1
+            request_id = None
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("A request must be a JSON object.")
+                request_id = request.get("id")
+                job = self._job(request, arrived)
+            except ValueError as error:  # Includes malformed JSON
+                await respond(arrived, {"id": request_id, "ok": False, "error": str(error)})
+                continue
+            if job is None:
+                await respond(arrived, {"id": request_id, "ok": True, "result": self.metrics()})
+                continue
+            await self._queue.put(job)
+            task = asyncio.create_task(self._answer(job, request_id, arrived, respond))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+
+    def _job(self, request, arrived):
+        """Checks a request and wraps it for the queue; None for "metrics"."""
+        op = request.get("op")
+        self._ops[str(op)] = self._ops.get(str(op), 0) + 1
+        if op == "metrics":
+            return None
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown op {op!r}, expected one of {OPERATIONS + ('metrics',)}.")
+        deadline = request.get("deadline")
+        if deadline is not None and (isinstance(deadline, bool) or not isinstance(deadline, (int, float))
+                                     or deadline <= 0):
+            raise ValueError("'deadline' must be a positive number of seconds.")
+        future = asyncio.get_running_loop().create_future()
+        return _Job(request, future, None if deadline is None else arrived + deadline)
+
+    async def _answer(self, job, request_id, arrived, respond):
+        timeout = None if job.deadline is None else job.deadline - asyncio.get_running_loop().time()
+        try:
+            ok, result = await asyncio.wait_for(asyncio.shield(job.future), timeout)
+        except asyncio.TimeoutError:
+            ok, result = False, "deadline_exceeded"
+        if not ok and result == "deadline_exceeded":
+            self._counts["deadline_exceeded"] += 1
+        await respond(arrived, {"id": request_id, "ok": True, "result": result} if ok
+                      else {"id": request_id, "ok": False, "error": result})
+
+    async def _dispatch_loop(self):
+        """
+        Submits queued requests to the pool one by one.
+
+        A request is taken off the queue only once a pool slot is free, so
+        the queue depth is the whole backlog.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            job = await self._queue.get()
+            self._queue.task_done()
+            now = loop.time()
+            if job.future.done() or job.deadline is not None and job.deadline <= now:
+                self._slots.release()
+                if not job.future.done():
+                    job.future.set_result((False, "deadline_exceeded"))
+                continue
+            deadline = None if job.deadline is None else time.time() + job.deadline - now
+            self._running += 1
+            future = loop.run_in_executor(self._pool, run_job, job.request, deadline)
+            future.add_done_callback(lambda done, job=job: self._finish(job, done))
+
+    def _finish(self, job, done):
+        self._slots.release()
+        self._running -= 1
+        if done.cancelled():
+            result = (False, "cancelled")
+        elif done.exception() is not None:
+            result = (False, f"worker failed: {done.exception()!r}")
+        else:
+            result = done.result()
+        if not job.future.done():
+            job.future.set_result(result)
+
+
+async def _stdio_lines():
+    loop = asyncio.get_running_loop()
+    while True:
+        line = await loop.run_in_executor(None, sys.stdin.buffer.readline)
+        if not line:
+            return
+        yield line
+
+
+async def _stdout_write(data):
+    sys.stdout.buffer.write(data)
+    sys.stdout.buffer.flush()
+
+
+async def _stream_lines(reader):
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        yield line
+
+
+async def serve(server, stdio=False, unix=None, tcp=None):
+    """
+    Runs the service on one transport until stdin ends or the process is
+    interrupted.
+
+    Args:
+        server (SolveServer): The service to run.
+        stdio (bool, optional): Serve a single client on stdin/stdout.
+        unix (str, optional): Path of a Unix socket to listen on.
+        tcp (tuple, optional): (host, port) to listen on.
+    """
+    await server.start()
+    try:
+        if stdio:
+            await server.handle_connection(_stdio_lines(), _stdout_write)
+            return
+
+        async def client(reader, writer):
+            async def write(data):
+                writer.write(data)
+                await writer.drain()
+            try:
+                await server.handle_connection(_stream_lines(reader), write)
+            except (ConnectionError, asyncio.CancelledError):  # Client gone, or the server is stopping
+                pass
+            finally:
+                writer.close()
+
+        if unix is not None:
+            listener = await asyncio.start_unix_server(client, path=unix)
+        else:
+            listener = await asyncio.start_server(client, *tcp)
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stopping.set)
+        async with listener:
+            await stopping.wait()
+        if unix is not None and os.path.exists(unix):
+            os.remove(unix)
+    finally:
+        await server.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Sudoku requests as JSON lines.")
+    transport = parser.add_mutually_exclusive_group(required=True)
+    transport.add_argument("--stdio", action="store_true", help="one client on stdin/stdout")
+    transport.add_argument("--unix", metavar="PATH", help="listen on a Unix socket")
+    transport.add_argument("--tcp", metavar="HOST:PORT", help="listen on TCP, e.g. 127.0.0.1:8765")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--max-queue", type=int, default=1024, help="queued requests before reading pauses")
+    args = parser.parse_args(argv)
+
+    tcp = None
+    if args.tcp:
+        host, _, port = args.tcp.rpartition(":")
+        tcp = (host or "127.0.0.1", int(port))
+    server = SolveServer(args.workers, args.max_queue)
+    asyncio.run(serve(server, args.stdio, args.unix, tcp))
+
+
+if __name__ == "__main__":
+    main()
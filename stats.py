@@ -0,0 +1,65 @@
+"""
+Counters and callbacks for watching the solver.
+
+Pass a SolverStats to Sudoku(stats=...) to have the solver fill it in.
+The same object can be shared by several solves to add up their work.
+SolverHooks are called on every assignment, propagation and backtrack.
+With neither given, the solver only pays for an 'is None' check at each
+of those points.
+"""
+
+
+class SolverStats:
+    """
+    Work done by the solver.
+
+    Attributes:
+        nodes (int): Values tried by the search (calls to assign).
+        backtracks (int): Search branches abandoned after every value failed.
+        max_depth (int): Deepest level the search reached.
+        revise_calls (int): Arcs revised during arc consistency.
+        removals (int): Values removed from domains by propagation.
+        mrv_calls (int): Calls to get_mrv.
+        propagation_time (float): Seconds spent in arc consistency.
+        search_time (float): Seconds spent in the search itself.
+        history_time (float): Seconds spent recording history steps.
+    """
+    __slots__ = (
+        "nodes", "backtracks", "max_depth", "revise_calls", "removals",
+        "mrv_calls", "propagation_time", "search_time", "history_time",
+    )
+
+    def __init__(self):
+        self.nodes = 0
+        self.backtracks = 0
+        self.max_depth = 0
+        self.revise_calls = 0
+        self.removals = 0
+        self.mrv_calls = 0
+        self.propagation_time = 0.0
+        self.search_time = 0.0
+        self.history_time = 0.0
+
+    def as_dict(self):
+        """Returns the counters as a plain dict, e.g. for JSON output."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class SolverHooks:
+    """
+    Callbacks fired by the solver. Any of them may be left as None.
+
+    Attributes:
+        on_assign (callable): on_assign(sudoku, (row, col), value), called
+                              when the search places a value.
+        on_propagate (callable): on_propagate(sudoku, consistent), called
+                                 after each arc consistency pass.
+        on_backtrack (callable): on_backtrack(sudoku, (row, col)), called
+                                 when every value of a cell has failed.
+    """
+    __slots__ = ("on_assign", "on_propagate", "on_backtrack")
+
+    def __init__(self, on_assign=None, on_propagate=None, on_backtrack=None):
+        self.on_assign = on_assign
+        self.on_propagate = on_propagate
+        self.on_backtrack = on_backtrack